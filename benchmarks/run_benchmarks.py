@@ -0,0 +1,218 @@
+# Benchmarks for mlflow_tasks overhead and throughput
+#
+# Runs against a fresh local file-based tracking URI in a temporary directory and writes the results as JSON:
+#   python benchmarks/run_benchmarks.py --output results.json
+#   python benchmarks/run_benchmarks.py --output new.json --compare results.json
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import tempfile
+import statistics
+import subprocess
+
+project_folder = os.path.abspath(os.path.join(os.path.dirname(os.path.realpath(__file__)), '..'))
+sys.path.insert(0, project_folder)
+
+payload_sizes = [1_000, 1_000_000, 10_000_000]
+quick_payload_sizes = [1_000, 100_000]
+flow_sizes = [1, 5, 10, 20]
+quick_flow_sizes = [1, 5]
+
+def timed(func, repeat):
+    # Seconds for each call of func
+    times = []
+    for i in range(repeat):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    return times
+
+def summarize(times, bytes_per_call=None):
+    summary = {
+        "repeat": len(times),
+        "mean_s": statistics.mean(times),
+        "median_s": statistics.median(times),
+        "min_s": min(times)
+    }
+    if not bytes_per_call is None:
+        summary["bytes"] = bytes_per_call
+        summary["mb_per_s"] = bytes_per_call / summary["median_s"] / 1e6
+    return summary
+
+def noop():
+    return None
+
+def bench_task_overhead(args):
+    import mlflow_tasks
+    times = timed(lambda: mlflow_tasks.Task(noop, experiment_name="bench_task_overhead"), args.repeat)
+    return {"empty_func_task": summarize(times)}
+
+def bench_py_obj_handler(args):
+    import mlflow
+    from mlflow_tasks import data_handlers
+    results = {}
+    run = mlflow.start_run(experiment_id=mlflow_tasks_experiment("bench_py_obj_handler"))
+    mlflow.end_run()
+    for size in args.payload_sizes:
+        payload = os.urandom(size)
+        path = f"bench/payload_{size}"
+
+        def write_local():
+            dh = data_handlers.Py_Obj_Handler()
+            dh.register(run.info.experiment_id, run.info.run_id, path)
+            dh.set(payload)
+            dh.cache_local()
+        def write_log():
+            dh = data_handlers.Py_Obj_Handler()
+            dh.register(run.info.experiment_id, run.info.run_id, path)
+            dh.set(payload)
+            dh.log()
+        def read_local():
+            dh = data_handlers.Py_Obj_Handler()
+            dh.register(run.info.experiment_id, run.info.run_id, path)
+            dh.get()
+        def read_log():
+            # Clear the local cache so the read comes from the artifact store
+            shutil.rmtree(os.path.join(os.path.abspath(''), "mlflow_tasks_cache", run.info.experiment_id, run.info.run_id), ignore_errors=True)
+            read_local()
+
+        results[str(size)] = {
+            "write_local_cache": summarize(timed(write_local, args.repeat), size),
+            "write_log": summarize(timed(write_log, args.repeat), size),
+            "read_local_cache": summarize(timed(read_local, args.repeat), size),
+            "read_log": summarize(timed(read_log, args.repeat), size)
+        }
+    return results
+
+def bench_pandas_df_handler(args):
+    import numpy
+    import pandas
+    from mlflow_tasks import data_handlers
+    results = {}
+    cache_dir = tempfile.mkdtemp(dir=os.path.abspath(''))
+    for size in args.payload_sizes:
+        # 10 float columns, 8 bytes per value
+        df = pandas.DataFrame(numpy.random.rand(max(1, size // 80), 10))
+        dh = data_handlers.Pandas_Df_Handler()
+        results[str(size)] = {
+            "write": summarize(timed(lambda: dh.cache(df, cache_dir), args.repeat), size),
+            "read": summarize(timed(lambda: dh.load(cache_dir), args.repeat), size)
+        }
+    return results
+
+def bench_data_handler_from_path(args):
+    import mlflow
+    from mlflow_tasks import data_handlers
+    from mlflow_tasks.data_handlers.utility import data_handler_from_path
+    run = mlflow.start_run(experiment_id=mlflow_tasks_experiment("bench_data_handler_from_path"))
+    mlflow.end_run()
+    dh = data_handlers.Py_Obj_Handler()
+    dh.register(run.info.experiment_id, run.info.run_id, "bench/result")
+    dh.set([1, 2, 3])
+    dh.log()
+    times = timed(lambda: data_handler_from_path(dh.full_path), args.repeat)
+    return {"resolve": summarize(times)}
+
+def bench_flow_scaling(args):
+    import mlflow_tasks
+    results = {}
+    for task_count in args.flow_sizes:
+        def run_flow():
+            flow = mlflow_tasks.Flow(experiment_name="bench_flow_scaling")
+            for i in range(task_count):
+                flow.start_task(noop, experiment_name="bench_flow_scaling_task")
+            flow.end_flow()
+        results[str(task_count)] = summarize(timed(run_flow, max(1, args.repeat // 2)))
+    return results
+
+heavy_modules = ["papermill", "nbconvert", "mlflow.pyfunc", "mlflow.projects", "pandas"]
+
+def bench_import_time(args):
+    # Time `import mlflow_tasks` in fresh interpreters, and list which heavy modules it loads
+    check = f"import sys, time; t = time.perf_counter(); import mlflow_tasks; print(time.perf_counter() - t); print([m for m in {heavy_modules} if m in sys.modules])"
+    times = []
+    for i in range(args.repeat):
+        output = subprocess.run([sys.executable, "-c", check], cwd=project_folder, capture_output=True, text=True, check=True).stdout.strip().splitlines()
+        times.append(float(output[-2]))
+    result = summarize(times)
+    result["loaded_modules"] = json.loads(output[-1].replace("'", '"'))
+    return {"import_mlflow_tasks": result}
+
+def mlflow_tasks_experiment(name):
+    import mlflow_tasks
+    return mlflow_tasks.get_or_create_experiment(name).experiment_id
+
+benchmarks = {
+    "import_time": bench_import_time,
+    "task_overhead": bench_task_overhead,
+    "py_obj_handler": bench_py_obj_handler,
+    "pandas_df_handler": bench_pandas_df_handler,
+    "data_handler_from_path": bench_data_handler_from_path,
+    "flow_scaling": bench_flow_scaling
+}
+
+def compare(results, baseline):
+    # Print the ratio of each median time to the baseline's (> 1 is slower)
+    def walk(new, old, name):
+        if "median_s" in new and "median_s" in old:
+            print(f"{name}: {new['median_s']:.4f}s vs {old['median_s']:.4f}s ({new['median_s'] / old['median_s']:.2f}x)")
+            return
+        for key, val in new.items():
+            if isinstance(val, dict) and isinstance(old.get(key), dict):
+                walk(val, old[key], f"{name}/{key}" if name else key)
+    walk(results["results"], baseline["results"], "")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark mlflow_tasks against a local file-based tracking URI.")
+    parser.add_argument("--output", default="bench_results.json", help="JSON file to write the results to")
+    parser.add_argument("--compare", default=None, help="JSON results file from an earlier run to compare against")
+    parser.add_argument("--only", nargs="*", choices=list(benchmarks), default=list(benchmarks), help="Benchmarks to run")
+    parser.add_argument("--repeat", type=int, default=10, help="Times to repeat each measurement")
+    parser.add_argument("--quick", action="store_true", help="Use small payloads and flows")
+    args = parser.parse_args(argv)
+    args.payload_sizes = quick_payload_sizes if args.quick else payload_sizes
+    args.flow_sizes = quick_flow_sizes if args.quick else flow_sizes
+    output_path = os.path.abspath(args.output)
+    compare_path = None if args.compare is None else os.path.abspath(args.compare)
+    start_dir = os.path.abspath('')
+
+    # Work in a scratch directory, the local cache is created in the working directory
+    work_dir = tempfile.mkdtemp(prefix="mlflow_tasks_bench_")
+    os.chdir(work_dir)
+    import mlflow
+    mlflow.set_tracking_uri("file://" + os.path.join(work_dir, "mlruns"))
+
+    results = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "mlflow": mlflow.__version__,
+            "repeat": args.repeat,
+            "quick": args.quick
+        },
+        "results": {}
+    }
+    try:
+        for name in args.only:
+            print(f"Running {name}...")
+            results["results"][name] = benchmarks[name](args)
+    finally:
+        os.chdir(start_dir)
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    with open(output_path, "w") as output_file:
+        json.dump(results, output_file, indent=2)
+    print(f"Results written to {output_path}")
+
+    if not compare_path is None:
+        with open(compare_path) as baseline_file:
+            compare(results, json.load(baseline_file))
+    return results
+
+if __name__ == "__main__":
+    main()
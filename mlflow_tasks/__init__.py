@@ -5,5 +5,9 @@ from .mlflow_tasks import get_or_create_experiment
 from .mlflow_tasks import active_task
 from .mlflow_tasks import get_task
 from .mlflow_tasks import start_task
+from .mlflow_tasks import start_task_async
+from .mlflow_tasks import get_task_async
+
+from .results import load_results
 
 from . import data_handlers
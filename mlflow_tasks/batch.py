@@ -0,0 +1,68 @@
+import itertools
+import mlflow
+from concurrent.futures import ProcessPoolExecutor
+
+# Model loaded once in each batch worker process
+worker_model = None
+
+def split_input(model_input, batch_size):
+    # Yield consecutive row chunks of the model input
+    if isinstance(model_input, dict) or not hasattr(model_input, "__len__"):
+        # Can't split by rows, score it as one chunk
+        yield model_input
+        return
+    for start in range(0, len(model_input), batch_size):
+        # DataFrames and Series are split by position, arrays and lists by slice
+        if hasattr(model_input, "iloc"):
+            yield model_input.iloc[start:start + batch_size]
+        else:
+            yield model_input[start:start + batch_size]
+
+def combine_predictions(predictions):
+    # Join chunk predictions back together in input order
+    if len(predictions) == 0:
+        return None
+    first = predictions[0]
+    if hasattr(first, "iloc"):
+        import pandas
+        return pandas.concat(predictions)
+    if hasattr(first, "shape"):
+        import numpy
+        return numpy.concatenate(predictions)
+    if isinstance(first, list):
+        return list(itertools.chain.from_iterable(predictions))
+    return predictions
+
+def init_worker(model_uri, tracking_uri):
+    global worker_model
+    import mlflow.pyfunc
+    mlflow.set_tracking_uri(tracking_uri)
+    worker_model = mlflow.pyfunc.load_model(model_uri)
+
+def predict_chunk(chunk):
+    return worker_model.predict(chunk)
+
+def predict_in_batches(model_uri, model_input, batch_size, workers=None):
+    import mlflow.pyfunc
+    chunks = split_input(model_input, batch_size)
+    predictions = []
+
+    if workers is None or workers <= 1:
+        # Score the chunks one at a time in this process
+        model = mlflow.pyfunc.load_model(model_uri)
+        for chunk in chunks:
+            predictions.append(model.predict(chunk))
+        return combine_predictions(predictions)
+
+    # Score the chunks on a process pool, keeping a bounded number in flight
+    max_in_flight = workers * 2
+    with ProcessPoolExecutor(max_workers=workers, initializer=init_worker, initargs=(model_uri, mlflow.get_tracking_uri())) as pool:
+        in_flight = []
+        for chunk in chunks:
+            in_flight.append(pool.submit(predict_chunk, chunk))
+            if len(in_flight) >= max_in_flight:
+                predictions.append(in_flight.pop(0).result())
+        for future in in_flight:
+            predictions.append(future.result())
+
+    return combine_predictions(predictions)
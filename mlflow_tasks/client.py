@@ -0,0 +1,118 @@
+import os
+import time
+import random
+import threading
+import mlflow
+from mlflow.entities import Metric, Param, RunTag
+from mlflow.exceptions import MlflowException
+from mlflow.tracking import MlflowClient
+
+# One MlflowClient per tracking URI, shared by Tasks, data handlers and result loading
+# MLFlow keeps a pooled keep-alive HTTP session per process, so sharing the client shares its connections
+
+client_settings = {
+    # Tracking and artifact calls in flight at once, per process
+    "max_concurrency": int(os.environ.get("MLFLOW_TASKS_CLIENT_CONCURRENCY", 8)),
+    # Times a call is retried after a transient error MLFlow didn't retry itself
+    "max_retries": int(os.environ.get("MLFLOW_TASKS_CLIENT_RETRIES", 3)),
+    # Seconds before the first retry, doubled for each further retry
+    "backoff": float(os.environ.get("MLFLOW_TASKS_CLIENT_BACKOFF", 0.5))
+}
+
+# Calls that aren't retried, after an ambiguous failure they may have created a run or experiment,
+# or logged metric points, already
+not_retried = ["create_run", "create_experiment", "log_metric"]
+
+clients = {}
+clients_lock = threading.Lock()
+clients_pid = None
+call_slots = None
+
+def configure_client(max_concurrency=None, max_retries=None, backoff=None):
+    # Change the shared client settings, clients created afterwards use them
+    global call_slots
+    for key, val in [("max_concurrency", max_concurrency), ("max_retries", max_retries), ("backoff", backoff)]:
+        if not val is None:
+            client_settings[key] = val
+    with clients_lock:
+        clients.clear()
+        call_slots = None
+
+def is_transient(error):
+    # Only errors MLFlow doesn't already retry: its HTTP requests (tracking server and mlflow-artifacts)
+    # are retried on connection errors and 429/5xx responses, MLFLOW_HTTP_REQUEST_MAX_RETRIES times,
+    # so those are left to it. What's left are connection errors from other artifact store transports.
+    import requests
+    if isinstance(error, (requests.exceptions.RequestException, MlflowException)):
+        return False
+    if isinstance(error.__context__, requests.exceptions.RequestException):
+        return False
+    return isinstance(error, (ConnectionError, TimeoutError))
+
+def is_retryable(name, args, kwargs):
+    if name in not_retried:
+        return False
+    # Metric points would be logged twice
+    metrics = kwargs.get("metrics", args[1] if len(args) > 1 else None)
+    return not (name == "log_batch" and metrics)
+
+class Retrying_Client:
+    # Wraps an MlflowClient, limiting concurrent calls and retrying transient errors with backoff
+    def __init__(self, client, tracking_uri, slots):
+        self.client = client
+        self.tracking_uri = tracking_uri
+        self.slots = slots
+
+    def __getattr__(self, name):
+        if name.startswith("__"):
+            raise AttributeError(name)
+        attr = getattr(self.client, name)
+        if not callable(attr):
+            return attr
+        def call(*args, **kwargs):
+            retries = client_settings["max_retries"] if is_retryable(name, args, kwargs) else 0
+            for attempt in range(retries + 1):
+                try:
+                    with self.slots:
+                        return attr(*args, **kwargs)
+                except Exception as e:
+                    if attempt == retries or not is_transient(e):
+                        raise
+                    delay = client_settings["backoff"] * 2**attempt
+                    print(f"DEBUG client {name} failed ({e!r}), retrying in {delay:.1f}s")
+                    time.sleep(delay * random.uniform(0.5, 1.5))
+        return call
+
+    def __reduce__(self):
+        # Unpickle as the shared client of the receiving process
+        return (get_client, (self.tracking_uri,))
+
+def get_client(tracking_uri=None):
+    # The shared client for the tracking URI (the current one by default)
+    global clients_pid, call_slots
+    if tracking_uri is None:
+        tracking_uri = mlflow.get_tracking_uri()
+    with clients_lock:
+        if clients_pid != os.getpid():
+            # Forked processes get their own clients and connections
+            clients.clear()
+            call_slots = None
+            clients_pid = os.getpid()
+        if call_slots is None:
+            call_slots = threading.BoundedSemaphore(client_settings["max_concurrency"])
+            # Let every concurrent call keep its own pooled connection
+            os.environ.setdefault("MLFLOW_HTTP_POOL_MAXSIZE", str(max(10, client_settings["max_concurrency"])))
+        if not tracking_uri in clients:
+            clients[tracking_uri] = Retrying_Client(MlflowClient(tracking_uri=tracking_uri), tracking_uri, call_slots)
+        return clients[tracking_uri]
+
+def log_metrics(run_id, metrics):
+    # Log a dict of metrics to a run in one call
+    timestamp = int(time.time() * 1000)
+    get_client().log_batch(run_id, metrics=[Metric(key, float(val), timestamp, 0) for key, val in metrics.items()])
+
+def log_params(run_id, params):
+    get_client().log_batch(run_id, params=[Param(key, str(val)) for key, val in params.items()])
+
+def set_tags(run_id, tags):
+    get_client().log_batch(run_id, tags=[RunTag(key, str(val)) for key, val in tags.items()])
@@ -1,5 +1,5 @@
 import os
-import pandas
+import yaml
 
 class Pandas_Df_Handler:
     def __init__(self):
@@ -22,6 +22,8 @@ class Pandas_Df_Handler:
         return cache_dir
 
     def load(self, cache_dir):
+        # Only DataFrame handlers need pandas
+        import pandas
         # TODO handle multiIndex dfs
         cache_uri = os.path.join(cache_dir, "result.csv")
         result = pandas.read_csv(cache_uri, index_col=0)
@@ -3,10 +3,32 @@ import pickle
 import yaml
 import mlflow
 from .utility import *
-from mlflow.tracking import MlflowClient
+from ..client import get_client
+
+# Writes skipped across all handlers because the data was already persisted, and the bytes they would have written
+persist_stats = {"skipped_writes": 0, "avoided_bytes": 0}
+
+class Byte_Counter:
+    # A file that only counts the bytes written to it, to size a pickle without holding it in memory
+    def __init__(self):
+        self.size = 0
+
+    def write(self, data):
+        self.size += memoryview(data).nbytes
+
+def data_size(data):
+    # Bytes the data takes, from pandas or numpy when they know, or else its pickled size
+    if hasattr(data, "memory_usage"):
+        size = data.memory_usage(deep=True)
+        return int(size.sum()) if hasattr(size, "sum") else int(size)
+    if isinstance(getattr(data, "nbytes", None), int):
+        return data.nbytes
+    counter = Byte_Counter()
+    pickle.dump(data, counter)
+    return counter.size
 
 class Py_Obj_Handler:
-    def __init__(self, cache_dir=None):
+    def __init__(self, cache_dir=None, global_cache_dir=None):
         self.__data__ = None
         self.full_path = None
         self.path = None
@@ -15,11 +37,21 @@ class Py_Obj_Handler:
         self.global_cache_uri = None
         self.experiment_id = None
         self.run_id = None
+        # Pickled size of the in-memory data, once measured
+        self.data_size = None
+        # Bumped by set(), and the version last written to each tier
+        self.version = 0
+        self.persisted_versions = {"local": None, "log": None, "global": None}
+        self.skipped_writes = 0
+        self.avoided_bytes = 0
         if cache_dir is None:
             cache_dir = os.path.join(os.path.abspath(''), "mlflow_tasks_cache")
         self.cache_dir = cache_dir
+        if global_cache_dir is None:
+            global_cache_dir = default_global_cache_dir()
+        self.global_cache_dir = global_cache_dir
         
-        self.mlflow_client = MlflowClient()
+        self.mlflow_client = get_client()
 
     def register(self, experiment_id, run_id, path):
         # Sets the experiment, run, and relative path
@@ -27,59 +59,135 @@ class Py_Obj_Handler:
         self.run_id = run_id
         self.experiment_id = experiment_id
         self.path = path
-    
+        # Nothing is written at the new path yet
+        self.persisted_versions = {"local": None, "log": None, "global": None}
+
+    def is_clean(self, tier):
+        # The current data was already written to the tier
+        if self.persisted_versions[tier] != self.version:
+            return False
+        if tier == "local":
+            return not self.local_cache_uri is None and os.path.exists(self.local_cache_uri)
+        return True
+
+    def skip_write(self):
+        # Count a write that wasn't needed, by the size of the cached pickle
+        size = os.path.getsize(self.local_cache_uri) if not self.local_cache_uri is None and os.path.exists(self.local_cache_uri) else 0
+        self.skipped_writes += 1
+        self.avoided_bytes += size
+        persist_stats["skipped_writes"] += 1
+        persist_stats["avoided_bytes"] += size
+
     def cache_local(self):
-        # TODO check if already cached
         # Write to cache accessible inside of this machine
+        if self.is_clean("local"):
+            self.skip_write()
+            return self.local_cache_uri
+        return self.__write_local__()
+
+    def __write_local__(self):
+        # Internal refreshes of a clean tier aren't counted as skipped writes, callers never asked for them
+        if self.is_clean("local"):
+            return self.local_cache_uri
         local_cache_dir, local_cache_uri = path_to_dir_uri(self.full_path, self.cache_dir)
         
         os.makedirs(local_cache_dir, exist_ok=True)
         with open(local_cache_uri,'wb') as cache_file:
             pickle.dump(self.__data__, cache_file)
         
-        # Create Metadata
-        metadata = {
+        # Save metadata to yaml
+        self.log_metadata()
+        #print(f"DEBUG DH.cache_local {self.path} ({self.__data__}) to {local_cache_uri} and {local_meta_uri}")
+        # Set cache uri
+        self.local_cache_uri = local_cache_uri
+        self.persisted_versions["local"] = self.version
+        
+        return self.local_cache_uri
+
+    def log_metadata(self):
+        # Log the metadata without the data, so another process reopening the run gets this handler
+        local_meta_dir, local_meta_uri = path_to_metadata_dir_uri(self.full_path, self.cache_dir)
+        os.makedirs(local_meta_dir, exist_ok=True)
+        with open(local_meta_uri, 'w') as metadata_file:
+            yaml.dump(self.metadata(), metadata_file)
+        self.mlflow_client.log_artifact(self.run_id, local_meta_uri, self.path)
+
+    def metadata(self):
+        return {
             "data_handler": "Py_Obj_Handler",
             "handler_args": {
-                "cache_dir": self.cache_dir
+                "cache_dir": self.cache_dir,
+                "global_cache_dir": self.global_cache_dir
             },
             "full_path": self.full_path,
             "experiment_id": self.experiment_id,
             "run_id": self.run_id,
             "path": self.path
         }
-        
-        # Save metadata to yaml
-        local_meta_dir, local_meta_uri = path_to_metadata_dir_uri(self.full_path, self.cache_dir)
-        
-        with open(local_meta_uri, 'w') as metadata_file:
-            yaml.dump(metadata, metadata_file)
-        self.mlflow_client.log_artifact(self.run_id, local_meta_uri, self.path)
-        #print(f"DEBUG DH.cache_local {self.path} ({self.__data__}) to {local_cache_uri} and {local_meta_uri}")
-        # Set cache uri
-        self.local_cache_uri = local_cache_uri
-        
-        return self.local_cache_uri
 
     def log(self):
-        # TODO check if already logged
+        if self.is_clean("log"):
+            self.skip_write()
+            return self.full_path
+        return self.__write_log__()
+
+    def __write_log__(self):
+        if self.is_clean("log"):
+            return self.full_path
         # Save to local dir first
-        if self.local_cache_uri is None:
-            self.cache_local()
+        self.__write_local__()
         
         self.mlflow_client.log_artifact(self.run_id, self.local_cache_uri, self.path)
         self.log_uri = self.full_path
+        self.persisted_versions["log"] = self.version
 
         return self.full_path
     
     def cache_global(self):
         # Write to cache accessible outside of this machine
-        log_uri = self.log()
-        self.global_cache_uri = log_uri
-        return log_uri
+        if self.is_clean("global"):
+            self.skip_write()
+            return self.global_cache_uri
+        if self.global_cache_dir is None:
+            # Without a shared directory the run's artifacts are the global cache
+            global_cache_uri = self.__write_log__()
+        else:
+            global_cache_dir, global_cache_uri = path_to_dir_uri(self.full_path, self.global_cache_dir)
+            global_meta_dir, global_meta_uri = path_to_metadata_dir_uri(self.full_path, self.global_cache_dir)
+            # Other nodes may be writing the same path
+            with locked(global_cache_uri):
+                atomic_write(global_cache_uri, pickle.dumps(self.__data__))
+                atomic_write(global_meta_uri, yaml.dump(self.metadata()).encode("utf-8"))
+        self.global_cache_uri = global_cache_uri
+        self.persisted_versions["global"] = self.version
+        return global_cache_uri
 
     def set(self, dataset):
+        # Changing the data in place isn't tracked, set() it again to have it written again
         self.__data__ = dataset
+        self.data_size = None
+        self.version += 1
+
+    def in_memory(self):
+        return not self.__data__ is None
+
+    def persisted(self):
+        # The data can be loaded again from the local cache or the log
+        return self.is_clean("local") or self.is_clean("log")
+
+    def release(self):
+        # Drop the in-memory data if it can be loaded again, get() reloads it
+        if not self.persisted():
+            return False
+        self.__data__ = None
+        self.data_size = None
+        return True
+
+    def size(self):
+        # Bytes the in-memory data takes
+        if self.data_size is None:
+            self.data_size = data_size(self.__data__) if self.in_memory() else 0
+        return self.data_size
     
     def get(self):
         if not self.__data__ is None:
@@ -94,11 +202,14 @@ class Py_Obj_Handler:
                 self.__data__ = pickle.load(cache_file)
             # Set cache uri
             self.local_cache_uri = local_cache_uri
+            self.persisted_versions["local"] = self.version
         except:
             #print(f"DEBUG DH.load cache miss: {local_cache_uri}")
+            # Check global cache
+            if self.get_global(local_cache_dir, local_cache_uri):
+                return self.__data__
 
             try:
-                # Check global cache
                 # Check log
                 # Create log uri
 
@@ -113,9 +224,39 @@ class Py_Obj_Handler:
 
                 # Set cache uri
                 self.local_cache_uri = local_cache_uri
-                self.global_cache_uri = self.path
                 self.log_uri = self.path
+                self.persisted_versions.update({"local": self.version, "log": self.version})
+                if self.global_cache_dir is None:
+                    # The log is the global cache
+                    self.global_cache_uri = self.path
+                    self.persisted_versions["global"] = self.version
             except:
                 pass
         
-        return self.__data__
\ No newline at end of file
+        return self.__data__
+
+    def get_global(self, local_cache_dir, local_cache_uri):
+        # Load from the global cache, and keep a copy in the local cache for the next read
+        if self.global_cache_dir is None:
+            return False
+        global_cache_dir, global_cache_uri = path_to_dir_uri(self.full_path, self.global_cache_dir)
+        try:
+            with open(global_cache_uri, 'rb') as cache_file:
+                data = cache_file.read()
+        except OSError:
+            return False
+        #print(f"DEBUG DH.load global cache hit: {global_cache_uri}")
+        self.__data__ = pickle.loads(data)
+        self.global_cache_uri = global_cache_uri
+        self.persisted_versions["global"] = self.version
+        try:
+            # With its metadata, so the local copy can be found without the tracking server
+            os.makedirs(local_cache_dir, exist_ok=True)
+            atomic_write(local_cache_uri, data)
+            local_meta_dir, local_meta_uri = path_to_metadata_dir_uri(self.full_path, self.cache_dir)
+            atomic_write(local_meta_uri, yaml.dump(self.metadata()).encode("utf-8"))
+            self.local_cache_uri = local_cache_uri
+            self.persisted_versions["local"] = self.version
+        except OSError as e:
+            print(f"DEBUG DH.load could not copy {global_cache_uri} to the local cache: {e!r}")
+        return True
@@ -1,9 +1,46 @@
 import os
+import glob
+import asyncio
+import tempfile
+from contextlib import contextmanager
+try:
+    import fcntl
+except ImportError:
+    # Not available on Windows, global cache writes aren't locked there
+    fcntl = None
 import mlflow_tasks.data_handlers as data_handlers
-from mlflow.tracking import MlflowClient
+from ..client import get_client
 
 cache_dir = os.path.join(os.path.abspath(''), "mlflow_tasks_cache")
 
+def default_global_cache_dir():
+    # A directory shared by all nodes, e.g. on a network file system, or None to use the run's artifacts
+    return os.environ.get("MLFLOW_TASKS_GLOBAL_CACHE_DIR")
+
+@contextmanager
+def locked(uri):
+    # Hold an exclusive lock on <uri>.lock, so only one process writes the file at a time
+    os.makedirs(os.path.dirname(uri), exist_ok=True)
+    with open(uri + ".lock", "a") as lock_file:
+        if not fcntl is None:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if not fcntl is None:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+def atomic_write(uri, data):
+    # Write to a temporary file and move it into place, so readers never see a partial file
+    temp_fd, temp_uri = tempfile.mkstemp(dir=os.path.dirname(uri), prefix=".tmp_")
+    try:
+        with os.fdopen(temp_fd, "wb") as temp_file:
+            temp_file.write(data)
+        os.replace(temp_uri, uri)
+    except:
+        os.remove(temp_uri)
+        raise
+
 
 # +
 def path_to_dir_uri(full_path, local_dir):
@@ -33,7 +70,16 @@ def path_to_exp_run_path(full_path):
 
 def data_handler_from_path(full_path):
     import yaml
-    mlflow_client = MlflowClient()
+    if len(full_path.split("/")) < 3:
+        # Not a data handler path
+        return None
+    # The global cache has the metadata without a download
+    global_dir = default_global_cache_dir()
+    if not global_dir is None:
+        data_handler = data_handler_from_cache(full_path, global_dir, shared=True)
+        if not data_handler is None:
+            return data_handler
+    mlflow_client = get_client()
     experiment_id, run_id, log_path = path_to_exp_run_path(full_path)
     local_dir, local_metadata_uri = path_to_metadata_dir_uri(full_path, cache_dir)
     os.makedirs(local_dir, exist_ok=True)
@@ -57,3 +103,35 @@ def data_handler_from_path(full_path):
     data_handler.register(metadata['experiment_id'], metadata['run_id'], metadata['path'])
     
     return data_handler
+
+def data_handler_from_cache(full_path, local_dir=cache_dir, shared=False):
+    # Like data_handler_from_path, but only reads metadata already in the local cache, without tracking server I/O
+    # A shared (global) cache's metadata holds the writing node's paths, so the handler gets this node's instead
+    import yaml
+    if len(full_path.split("/")) < 3:
+        # Not a data handler path
+        return None
+    local_meta_dir, local_metadata_uri = path_to_metadata_dir_uri(full_path, local_dir)
+    if not os.path.exists(local_metadata_uri):
+        return None
+    with open(local_metadata_uri, 'r') as metadata_file:
+        metadata = yaml.safe_load(metadata_file)
+    data_handler_name = metadata['data_handler']
+    if not data_handler_name in data_handlers.__dict__:
+        raise Exception(f"Data handler {data_handler_name} not found.")
+    handler_args = metadata['handler_args']
+    if shared:
+        handler_args = dict(handler_args, cache_dir=cache_dir, global_cache_dir=local_dir)
+    data_handler = data_handlers.__dict__[data_handler_name](**handler_args)
+    data_handler.register(metadata['experiment_id'], metadata['run_id'], metadata['path'])
+    return data_handler
+
+def cached_experiment_id(run_id, local_dir=cache_dir):
+    # Find a run's experiment from the local cache layout (<cache>/<experiment id>/<run id>/...)
+    for run_dir in glob.glob(os.path.join(glob.escape(local_dir), "*", glob.escape(run_id))):
+        return os.path.basename(os.path.dirname(run_dir))
+    return None
+
+async def data_handler_from_path_async(full_path):
+    # Download the metadata in a worker thread
+    return await asyncio.to_thread(data_handler_from_path, full_path)
@@ -0,0 +1,120 @@
+import mlflow
+import os
+import marshal
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from mlflow.entities import RunStatus
+from .client import get_client
+from .timing import timed_phase
+from .profiling import profiled_action
+from .scheduling import measured_usage
+
+# Multiprocessing start method for each executor, spawned workers don't inherit the MLFlow run stack
+executor_contexts = {
+    "process": "spawn",
+    "forkserver": "forkserver"
+}
+
+# Modules imported once by the fork server, so the workers forked from it start with them loaded
+# Set before the first forkserver task, e.g. forkserver_preload.append("pandas")
+forkserver_preload = ["mlflow_tasks"]
+
+process_pools = {}
+
+# Compiled script code objects by path, with the file modification time they were compiled at
+script_code_cache = {}
+
+def get_process_pool(executor, workers=None):
+    # Pools are shared by all tasks using the same executor and worker count
+    if not executor in executor_contexts:
+        raise Exception(f"Invalid task executor {executor} (must be one of {list(executor_contexts)}).")
+    pool_key = (executor, workers)
+    if not pool_key in process_pools:
+        mp_context = multiprocessing.get_context(executor_contexts[executor])
+        if executor_contexts[executor] == "forkserver":
+            mp_context.set_forkserver_preload(forkserver_preload)
+        process_pools[pool_key] = ProcessPoolExecutor(max_workers=workers, mp_context=mp_context)
+    return process_pools[pool_key]
+
+def compile_script(script_path):
+    # Reuse the compiled code until the script file changes
+    mtime = os.path.getmtime(script_path)
+    if script_path in script_code_cache:
+        cached_mtime, script_code = script_code_cache[script_path]
+        if cached_mtime == mtime:
+            return script_code
+    with open(script_path) as script_file:
+        script_code = compile(script_file.read(), script_path, "exec")
+    script_code_cache[script_path] = (mtime, script_code)
+    return script_code
+
+def run_task(tracking_uri, run_id, run_action):
+    # Runs in a worker process: reattach to the task's run and execute the action there
+    from .mlflow_tasks import Task
+    mlflow.set_tracking_uri(tracking_uri)
+    task = Task(run_id=run_id)
+    # The worker runs the action, so its timings are recorded
+    task.records_timings = True
+    end_status = "FAILED"
+    try:
+        with timed_phase(task, "action"), profiled_action(task), measured_usage(task):
+            run_action(task)
+        # Write the result to the local cache, only the cache location goes back to the caller
+        task.data_handler.cache_local()
+        end_status = "FINISHED"
+    finally:
+        task.end_run(end_status)
+    return (end_status, task.data_handler.local_cache_uri)
+
+def run_func_task(tracking_uri, run_id, func):
+    def run_action(task):
+        result_data = func(**task.get_params())
+        task.set_result(result_data)
+    return run_task(tracking_uri, run_id, run_action)
+
+def run_script_task(tracking_uri, run_id, script_code_bytes):
+    from .mlflow_tasks import active_task_stack
+    def run_action(task):
+        # The script fetches the task from the stack, as it does when run in the calling process
+        active_task_stack.append(task)
+        loc_vars = {"active_task_stack": active_task_stack}
+        try:
+            exec(marshal.loads(script_code_bytes), {}, loc_vars)
+        finally:
+            # Don't leave the task for the next script run by this worker
+            if task in active_task_stack:
+                active_task_stack.remove(task)
+    return run_task(tracking_uri, run_id, run_action)
+
+class Future_Submitted_Run:
+    # A task running on a process pool, with the same interface as MLFlow's SubmittedRun for project runs
+    # (not subclassed, so the project stack is only imported by project tasks)
+    def __init__(self, run_id, future):
+        self._run_id = run_id
+        self.future = future
+        self.local_cache_uri = None
+
+    @property
+    def run_id(self):
+        return self._run_id
+
+    def wait(self):
+        try:
+            end_status, local_cache_uri = self.future.result()
+        except Exception:
+            # The worker may have died before it could end the run
+            get_client().set_terminated(self.run_id, RunStatus.to_string(RunStatus.FAILED))
+            raise
+        self.local_cache_uri = local_cache_uri
+        return end_status == RunStatus.to_string(RunStatus.FINISHED)
+
+    def get_status(self):
+        if not self.future.done():
+            return RunStatus.to_string(RunStatus.RUNNING)
+        if not self.future.exception() is None:
+            return RunStatus.to_string(RunStatus.FAILED)
+        end_status, local_cache_uri = self.future.result()
+        return end_status
+
+    def cancel(self):
+        self.future.cancel()
@@ -1,20 +1,70 @@
 import mlflow
 import os
-from mlflow.tracking import MlflowClient
-import mlflow.pyfunc
-from nbconvert import HTMLExporter
-import papermill
+import pickle
+import asyncio
+import hashlib
+import inspect
+import functools
+import marshal
+import threading
+import time
 from typing import Callable
 from mlflow.entities import RunStatus
 from . import data_handlers
-from .data_handlers.utility import cache_dir, data_handler_from_path
+from .batch import predict_in_batches
+from .profiling import profiled_action
+from .scheduling import Resource_Budget, task_resources, measured_usage, parse_memory
+from .client import get_client, log_metrics, log_params, set_tags
+from .results import search_all_runs, search_all_experiment_ids
+from .timing import timed_phase, timing_metrics, rollup_timing_metrics
+from .task_queue import Task_Queue, Queue_Submitted_Run, describe_action
+from .executors import get_process_pool, compile_script, run_func_task, run_script_task, Future_Submitted_Run
+from .data_handlers.utility import cache_dir, data_handler_from_path, data_handler_from_cache, cached_experiment_id
 
 default_data_handler = data_handlers.Py_Obj_Handler
 
-special_task_params = ['write_log', 'write_local_cache', 'write_global_cache', 'autolog']
+special_task_params = ['write_log', 'write_local_cache', 'write_global_cache', 'autolog', 'profile']
 
 active_task_stack = []
 
+# MLFlow's active run stack is shared by the whole process, so Tasks are started one thread at a time
+# The lock is held until Task() returns, in-process actions run on the stack too, so they run one at a time
+# Tasks with an executor, or async projects, return once handed over and so only hold it while starting
+task_start_lock = threading.Lock()
+
+def code_fingerprint(code):
+    # A fingerprint of a function's bytecode, constants and names, so functions with the same name (e.g. lambdas) differ
+    parts = [code.co_code, repr(code.co_names).encode("utf-8")]
+    for const in code.co_consts:
+        if inspect.iscode(const):
+            # Nested functions are fingerprinted in turn
+            parts.append(code_fingerprint(const).encode("utf-8"))
+        else:
+            parts.append(repr(const).encode("utf-8"))
+    return hashlib.sha256(b"\0".join(parts)).hexdigest()
+
+def task_key(action, params):
+    # A fingerprint of a task's action and params
+    if isinstance(action, Callable):
+        action_key = f"{action.__module__}.{action.__qualname__}"
+        if hasattr(action, "__code__"):
+            action_key += f":{code_fingerprint(action.__code__)}"
+    else:
+        action_key = repr(action)
+    param_keys = []
+    for p, val in sorted(params.items()):
+        if isinstance(val, str):
+            param_keys.append(f"{p}=str:{val}")
+        elif isinstance(val, Task):
+            # Tasks are matched by the result they came from
+            param_keys.append(f"{p}=task:{val.data_handler.full_path}")
+        else:
+            try:
+                param_keys.append(f"{p}=obj:{hashlib.sha256(pickle.dumps(val)).hexdigest()}")
+            except Exception:
+                param_keys.append(f"{p}=repr:{val!r}")
+    return hashlib.sha256("\n".join([action_key] + param_keys).encode("utf-8")).hexdigest()
+
 def get_or_create_experiment(experiment_name):
     experiment = mlflow.get_experiment_by_name(experiment_name)
     if not experiment:
@@ -31,14 +81,29 @@ def active_task():
     else:
         return None
 
-def get_task(run_id):
+def get_task(run_id, read_only=False):
+    if read_only:
+        return Task.from_cache(run_id)
     return Task(run_id=run_id)
 
 def start_task(**args):
     return Task(**args)
 
+def start_task_locked(*args, **kwargs):
+    with task_start_lock:
+        return Task(*args, **kwargs)
+
+async def start_task_async(*args, **kwargs):
+    # Start the Task in a worker thread so the event loop keeps running
+    # In-process actions are run by Task(), so they don't run concurrently, see task_start_lock
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(None, functools.partial(start_task_locked, *args, **kwargs))
+
+async def get_task_async(run_id):
+    return await start_task_async(run_id=run_id)
+
 class Task:
-    def __init__(self, action=None, run_id=None, experiment_id=None, experiment_name=None, write_log=False, write_local_cache=False, write_global_cache=False, autolog=True, data_handler=None, **params):
+    def __init__(self, action=None, run_id=None, experiment_id=None, experiment_name=None, write_log=False, write_local_cache=False, write_global_cache=False, autolog=True, data_handler=None, synchronous=True, executor=None, executor_workers=None, profile=None, resources=None, logged_params=None, **params):
         # If there is an active Task, then this is being run in a script Task
         if len(active_task_stack) > 0:
             # Pop the active Task off of the stack and assume it
@@ -47,13 +112,16 @@ class Task:
             self.__dict__ = self_task.__dict__
             return None
             
-        self.result = None
-        self.run = None
-        self.write_log = write_log
-        self.write_local_cache = write_local_cache
-        self.write_global_cache = write_global_cache
-        self.params = params
-        self.autolog = autolog
+        self.__init_state__(write_log=write_log, write_local_cache=write_local_cache, write_global_cache=write_global_cache, autolog=autolog, synchronous=synchronous, executor=executor, executor_workers=executor_workers, profile=profile, params=params)
+        self.resources = task_resources(action, resources)
+        # Params the Task that queued this one already logged, as strings, for a queue worker to log the same values
+        self.logged_params = logged_params
+        # Reopening an existing run, e.g. with get_task, doesn't replace the timings of the task that ran
+        self.records_timings = run_id is None or not action is None
+
+        if isinstance(executor, Task_Queue):
+            # Queued tasks may run on other hosts, so results go to the tracking store
+            self.write_log = True
 
         action_name = None
 
@@ -78,48 +146,45 @@ class Task:
             experiment_name = action_name
 
         ## Get/Create the experiment
-        if not experiment_id is None:
-            self.experiment_id = experiment_id
-        elif not experiment_name is None:
-            task_experiment = get_or_create_experiment(experiment_name)
-            self.experiment_id = task_experiment.experiment_id
-        else:
-            self.experiment_id = None
+        with timed_phase(self, "experiment"):
+            if not experiment_id is None:
+                self.experiment_id = experiment_id
+            elif not experiment_name is None:
+                task_experiment = get_or_create_experiment(experiment_name)
+                self.experiment_id = task_experiment.experiment_id
+            else:
+                self.experiment_id = None
         
         ## Start MLFlow Run
-        self.run = mlflow.start_run(run_id=run_id, experiment_id=self.experiment_id, nested=True)
-        
-        self.run_id = self.run.info.run_id
-        self.experiment_id = self.run.info.experiment_id
-        self.experiment_name = mlflow.get_experiment(self.run.info.experiment_id).name
+        with timed_phase(self, "start_run"):
+            self.run = mlflow.start_run(run_id=run_id, experiment_id=self.experiment_id, nested=True)
+            
+            self.run_id = self.run.info.run_id
+            self.experiment_id = self.run.info.experiment_id
+            self.experiment_name = mlflow.get_experiment(self.run.info.experiment_id).name
 
         ## Load task params
-        for p in special_task_params:
-            if p in self.run.data.tags:
-                param_val = self.run.data.tags[p]
-                if param_val == "True":
-                    param_val = True
-                elif param_val == "False":
-                    param_val = False
-                self.__setattr__(p, param_val)
+        self.__load_task_params__()
 
         ## Create the data handler
-        if not data_handler is None:
-            self.data_handler = data_handler
-            self.data_handler.register(self.experiment_id, self.run_id, "result")
-        else:
-            # Try to get existing logged data handler
-            self.data_handler = data_handler_from_path(f"{self.experiment_id}/{self.run_id}/result")
-            if self.data_handler is None:
-                # Fall back to default
-                self.data_handler = default_data_handler()
-                self.data_handler.register(self.experiment_id, self.run_id, "result")
+        with timed_phase(self, "data_handler"):
+            self.__init_data_handler__(data_handler)
 
         ## Save task params
-        for p in special_task_params:
-            param_val = self.__getattribute__(p)
-            if not param_val is None:
-                mlflow.set_tag(p, param_val)
+        with timed_phase(self, "tags"):
+            tags = {}
+            for p in special_task_params:
+                param_val = self.__getattribute__(p)
+                if not param_val is None:
+                    tags[p] = param_val
+            # Identify the action and params, so a resumed Flow can reuse this task
+            # Only when the run is created, a worker re-running it has loaded the params and would key them differently
+            if not action is None and run_id is None:
+                tags["task_key"] = task_key(action, params)
+                # Record the declared resources, to compare with the usage metrics
+                tags.update({f"resources.{key}": val for key, val in self.resources.items()})
+            # All tags in one request
+            set_tags(self.run_id, tags)
         
         self.print_status()
         
@@ -129,8 +194,11 @@ class Task:
         ## Execute the action for the task
         if not action is None:
             end_status = "FAILED"
+            # It is to be run by queue workers
+            if isinstance(self.executor, Task_Queue):
+                end_status = self.__enqueue__(action)
             # It is a function
-            if isinstance(action, Callable):
+            elif isinstance(action, Callable):
                 end_status = self.__exec_func__(action)
             # It is a string
             elif isinstance(action, str):
@@ -143,7 +211,7 @@ class Task:
                 elif "model_input" in params:
                 # is model uri
                 # TODO validate model uri
-                    end_status = self.__exec_model__(action, params["model_input"])
+                    end_status = self.__exec_model__(action, params["model_input"], params.get("batch_size"), params.get("workers"))
             elif isinstance(action, tuple):
                 if len(action) == 1:
                     action = (action[0], "main") # Default to main entry point, as does MLFlow
@@ -152,8 +220,89 @@ class Task:
                 #Fail
                 raise Exception("Invalid task action type (not a function or string).")
                 
-            # End the task
-            self.end_run(end_status)
+            # End the task, unless it was submitted to finish on its own
+            if end_status is None:
+                self.print_status()
+            else:
+                self.end_run(end_status)
+
+    def __init_state__(self, write_log=False, write_local_cache=False, write_global_cache=False, autolog=True, synchronous=True, executor=None, executor_workers=None, profile=None, params=None):
+        self.resources = task_resources()
+        self.start_time = time.time()
+        self.timings = {}
+        self.result = None
+        self.run = None
+        self.write_log = write_log
+        self.write_local_cache = write_local_cache
+        self.write_global_cache = write_global_cache
+        self.params = {} if params is None else params
+        self.autolog = autolog
+        self.synchronous = synchronous
+        self.executor = executor
+        # Worker processes for the executor's pool
+        self.executor_workers = executor_workers
+        self.profile = profile
+        self.submitted_run = None
+        self.read_only = False
+        self.records_timings = False
+        self.logged_params = None
+
+    def __load_task_params__(self):
+        for p in special_task_params:
+            if p in self.run.data.tags:
+                param_val = self.run.data.tags[p]
+                if param_val == "True":
+                    param_val = True
+                elif param_val == "False":
+                    param_val = False
+                self.__setattr__(p, param_val)
+
+    def __init_data_handler__(self, data_handler=None):
+        if not data_handler is None:
+            self.data_handler = data_handler
+            self.data_handler.register(self.experiment_id, self.run_id, "result")
+        else:
+            # Try to get existing logged data handler
+            self.data_handler = data_handler_from_path(f"{self.experiment_id}/{self.run_id}/result")
+            if self.data_handler is None:
+                # Fall back to default
+                self.data_handler = default_data_handler()
+                self.data_handler.register(self.experiment_id, self.run_id, "result")
+
+    @classmethod
+    def reattach(cls, run_id, data_handler=None):
+        # A handle on a past task's run and result, without starting the run again
+        task = cls.__new__(cls)
+        task.__init_state__()
+        task.run = get_client().get_run(run_id)
+        task.run_id = task.run.info.run_id
+        task.experiment_id = task.run.info.experiment_id
+        task.experiment_name = mlflow.get_experiment(task.experiment_id).name
+        task.__load_task_params__()
+        task.__init_data_handler__(data_handler)
+        return task
+
+    @classmethod
+    def from_cache(cls, run_id, experiment_id=None):
+        # A read-only handle on a past task, from the local cache metadata only
+        # Falls back to the tracking server if the result isn't in the local cache
+        if experiment_id is None:
+            experiment_id = cached_experiment_id(run_id)
+        data_handler = None
+        if not experiment_id is None:
+            data_handler = data_handler_from_cache(f"{experiment_id}/{run_id}/result")
+        if data_handler is None:
+            task = cls.reattach(run_id)
+        else:
+            task = cls.__new__(cls)
+            task.__init_state__()
+            # The run and experiment name are only fetched if asked for
+            task.run_id = run_id
+            task.experiment_id = experiment_id
+            task.experiment_name = None
+            task.data_handler = data_handler
+        task.read_only = True
+        return task
 
     def __enter__(self):
         # Allow this to be a context manager
@@ -164,6 +313,10 @@ class Task:
 
     def __exec_func__(self, func):
         # TODO add func to run information
+        if not self.executor is None:
+            # Run the function in a worker process
+            return self.__submit__(run_func_task, func)
+
         # Log params
         self.__log_params__()
         
@@ -176,7 +329,8 @@ class Task:
                 unpacked_params[p] = val
         
         # Run the task
-        result_data = func(**unpacked_params)
+        with timed_phase(self, "action"), profiled_action(self), measured_usage(self):
+            result_data = func(**unpacked_params)
         
         # Save result
         self.set_result(result_data)
@@ -185,22 +339,30 @@ class Task:
         return "FINISHED"
 
     def __exec_script__(self, script_path):
-        # Log params
         # TODO add script_path to run information
+        script_code = compile_script(script_path)
+        if not self.executor is None:
+            # Run the script in a worker process, sending the compiled code
+            return self.__submit__(run_script_task, marshal.dumps(script_code))
+
+        # Log params
         clean_params = self.__log_params__()
         
         # Save self task to a local variable
         active_task_stack.append(self)
         loc_vars = {"active_task_stack": active_task_stack}
         # Run the script with access to the local variable
-        with open(script_path) as script_file:
-            script_code = script_file.read()
+        with timed_phase(self, "action"), profiled_action(self), measured_usage(self):
             exec(script_code, {}, loc_vars)
         
         # End the run
         return "FINISHED"
         
     def __exec_nb__(self, nb_path):
+        # Notebook dependencies are only loaded by notebook tasks
+        import papermill
+        from nbconvert import HTMLExporter
+
         # TODO add nb_path to run information
         # Log params
         clean_params = self.__log_params__(cache_local=True)
@@ -217,32 +379,38 @@ class Task:
         os.makedirs(os.path.join(cache_dir, self.experiment_id, self.run_id, "artifacts"), exist_ok=True)
         
         # Run the notebook
-        papermill.execute_notebook(
-           nb_path,
-           nb_result_path,
-           parameters = clean_params
-        )
+        with timed_phase(self, "action"), measured_usage(self):
+            papermill.execute_notebook(
+               nb_path,
+               nb_result_path,
+               parameters = clean_params
+            )
         
         # Reset the MLFlow environment variables
         os.environ = env_old
         
         """Export the notebook to HTML and return the path"""
         html_path = nb_result_path.split(".")[0] + ".html"
-        # Create HTML exporter
-        html_exporter = HTMLExporter()
-        html_exporter.template_name = 'classic'
-        (html_text, resources) = html_exporter.from_filename(nb_result_path)
-        html_file = open(html_path,'wb')
-        html_file.write(html_text.encode("utf-8"))
-        html_file.close()
-        mlflow.log_artifact(html_path)
+        with timed_phase(self, "html_export"):
+            # Create HTML exporter
+            html_exporter = HTMLExporter()
+            html_exporter.template_name = 'classic'
+            (html_text, resources) = html_exporter.from_filename(nb_result_path)
+            html_file = open(html_path,'wb')
+            html_file.write(html_text.encode("utf-8"))
+            html_file.close()
+        with timed_phase(self, "artifact_upload"):
+            get_client().log_artifact(self.run_id, html_path)
         #mlflow.log_text(html_text.encode("utf-8"), html_path)
         print(f"HTML Report was generated: {html_path}")
         
         # End the run
         return "FINISHED"
 
-    def __exec_model__(self, model_uri, model_input):
+    def __exec_model__(self, model_uri, model_input, batch_size=None, workers=None):
+        # Model dependencies are only loaded by model tasks
+        import mlflow.pyfunc
+
         # TODO change they way model_uri is recorded on the run?
         # Log params      
         clean_params = self.__log_params__()
@@ -252,8 +420,13 @@ class Task:
             model_input = model_input.get_result()
 
         # Run the task
-        model = mlflow.pyfunc.load_model(model_uri)
-        result_data = model.predict(model_input)
+        with timed_phase(self, "action"), profiled_action(self), measured_usage(self):
+            if batch_size is None:
+                model = mlflow.pyfunc.load_model(model_uri)
+                result_data = model.predict(model_input)
+            else:
+                # Score the input in chunks, in parallel if there are workers
+                result_data = predict_in_batches(model_uri, model_input, batch_size, workers)
         
         # Save result
         self.set_result(result_data)
@@ -262,91 +435,187 @@ class Task:
         return "FINISHED"
     
     def __exec_project__(self, project_uri, entry_point):
+        # Project dependencies are only loaded by project tasks
+        import mlflow.projects
+
         # Log params      
         clean_params = self.__log_params__(cache_local=True)
         
-        # Set MLFlow environment variables
-        env_old = os.environ.copy()
-        os.environ["MLFLOW_TRACKING_URI"] = mlflow.tracking.get_tracking_uri()
-        os.environ["MLFLOW_EXPERIMENT_NAME"] = self.experiment_name
-        os.environ["MLFLOW_RUN_ID"] = str(self.run_id)
-        
         # Set result so that result data handler works in model process
         self.set_result(None)
         
         # Run the task
-        project_run = mlflow.projects.run(uri=project_uri, entry_point=entry_point, run_id=self.run_id)
-        
-        # Reset the MLFlow environment variables
-        os.environ = env_old
-        
-        return project_run.get_status()
+        # MLFlow passes the tracking uri, experiment and run to the project process in its own environment
+        if self.synchronous:
+            with timed_phase(self, "action"), measured_usage(self):
+                project_run = mlflow.projects.run(uri=project_uri, entry_point=entry_point, experiment_id=self.experiment_id, run_id=self.run_id, parameters={})
+            return project_run.get_status()
+
+        # Hand the run over to the project process and return without waiting
+        self.__detach__()
+        self.submitted_run = mlflow.projects.run(uri=project_uri, entry_point=entry_point, experiment_id=self.experiment_id, run_id=self.run_id, parameters={}, synchronous=False)
+        return None
 
-    def __log_params__(self, cache_local=False, cache_global=False, write_log=False):
+    def __submit__(self, worker, action):
+        # Cache params so the worker process can load them from the task's run
+        clean_params = self.__log_params__(cache_local=True)
+        # And the data handler, the worker process's Task finds it from the run
+        self.data_handler.log_metadata()
 
-        params_as_strs = {}
+        # Hand the run over to the worker process
+        self.__detach__()
+        pool = get_process_pool(self.executor, self.executor_workers)
+        future = pool.submit(worker, mlflow.get_tracking_uri(), self.run_id, action)
+        self.submitted_run = Future_Submitted_Run(self.run_id, future)
 
-        # take non-string params, cache them and replace with uris
-        for p, val in self.params.items():
-            if isinstance(val, str):
-                params_as_strs[p] = val
-
-            elif isinstance(val, Task):
-                p_handler = val.data_handler
-                if cache_local:
-                    p_handler.get()
-                    p_handler.cache_local()
-                if cache_global:
-                    p_handler.get()
-                    p_handler.cache_global()
-                if write_log:
-                    p_handler.get()
-                    p_handler.log()
-                params_as_strs[p] = p_handler.full_path
+        if self.synchronous:
+            self.wait()
+        return None
+
+    def __enqueue__(self, action):
+        # Log params to the tracking store so workers on any host can load them
+        clean_params = self.__log_params__(write_log=True)
+        # And the data handler, the worker's Task finds it from the run
+        self.data_handler.log_metadata()
+
+        descriptor = {
+            "action": describe_action(action),
+            "params": clean_params,
+            "run_id": self.run_id,
+            "experiment_id": self.experiment_id,
+            "tracking_uri": mlflow.get_tracking_uri()
+        }
+
+        # Hand the run over to whichever worker claims it
+        self.__detach__()
+        task_id = self.executor.submit(descriptor)
+        self.submitted_run = Queue_Submitted_Run(self.executor, task_id, self.run_id)
+
+        if self.synchronous:
+            self.wait()
+        return None
+
+    def __detach__(self):
+        # Release the run in this process without finishing it, another process will end it
+        self.__log_timings__()
+        mlflow.end_run(RunStatus.to_string(RunStatus.SCHEDULED))
+
+    def done(self):
+        # Check if a submitted task has completed
+        if self.submitted_run is None:
+            return True
+        return self.submitted_run.get_status() not in [RunStatus.to_string(RunStatus.SCHEDULED), RunStatus.to_string(RunStatus.RUNNING)]
+
+    def wait(self):
+        # Block until a submitted task has completed
+        if not self.submitted_run is None:
+            self.submitted_run.wait()
+            # Worker processes only send back where they cached the result
+            if isinstance(self.submitted_run, Future_Submitted_Run):
+                self.data_handler.local_cache_uri = self.submitted_run.local_cache_uri
+        return self.get_run().info.status
+
+    async def wait_async(self):
+        return await asyncio.to_thread(self.wait)
+
+    def __log_params__(self, cache_local=False, cache_global=False, write_log=False):
+
+        with timed_phase(self, "log_params"):
+            params_as_strs = {}
+
+            # take non-string params, cache them and replace with uris
+            for p, val in self.params.items():
+                if not self.logged_params is None and p in self.logged_params:
+                    # A worker's loaded params would be stored again under new paths, log what the queuing Task did
+                    params_as_strs[p] = self.logged_params[p]
+
+                elif isinstance(val, str):
+                    params_as_strs[p] = val
+
+                elif isinstance(val, Task):
+                    p_handler = val.data_handler
+                    if cache_local:
+                        p_handler.get()
+                        p_handler.cache_local()
+                    if cache_global:
+                        p_handler.get()
+                        p_handler.cache_global()
+                    if write_log:
+                        p_handler.get()
+                        p_handler.log()
+                    params_as_strs[p] = p_handler.full_path
                 
-            else:
-                sub_path = "/".join(["params", p])
-                p_handler = default_data_handler()
-                p_handler.register(self.experiment_id, self.run_id, sub_path)
-                p_handler.set(val)
+                else:
+                    sub_path = "/".join(["params", p])
+                    p_handler = default_data_handler()
+                    p_handler.register(self.experiment_id, self.run_id, sub_path)
+                    p_handler.set(val)
                 
-                if cache_local:
-                    p_handler.cache_local()
-                if cache_global:
-                    p_handler.cache_global()
-                if write_log:
-                    p_handler.log()
-                params_as_strs[p] = p_handler.full_path
+                    if cache_local:
+                        p_handler.cache_local()
+                    if cache_global:
+                        p_handler.cache_global()
+                    if write_log:
+                        p_handler.log()
+                    params_as_strs[p] = p_handler.full_path
 
-        mlflow.log_params(params_as_strs)
-        self.get_run()
+            log_params(self.run_id, params_as_strs)
+            self.get_run()
 
         return params_as_strs
 
     def get_run(self):
-        self.run = mlflow.get_run(self.run.info.run_id)
+        self.run = get_client().get_run(self.run_id)
         return self.run
     
     def set_result(self, result):
-        
-        self.result = result
-        self.data_handler.set(result)
-            
-        if self.write_local_cache:
-            self.data_handler.cache_local()
-        if self.write_global_cache:
-            self.data_handler.cache_global()
-        if self.write_log:
-            self.data_handler.log()
+        if self.read_only:
+            raise Exception(f"Task {self.run_id} is read-only, its result can't be set.")
+
+        with timed_phase(self, "set_result"):
+            self.result = result
+            self.data_handler.set(result)
+                
+            if self.write_local_cache:
+                self.data_handler.cache_local()
+        with timed_phase(self, "artifact_upload"):
+            if self.write_global_cache:
+                self.data_handler.cache_global()
+            if self.write_log:
+                self.data_handler.log()
         
         return self.data_handler
     
+    async def set_result_async(self, result):
+        # Caching and logging the result happens in a worker thread
+        return await asyncio.to_thread(self.set_result, result)
+
     def get_result(self):
+        # Wait for a submitted task to produce its result
+        if not self.done():
+            self.wait()
         result = self.data_handler.get()
         return result
+
+    def release_result(self, spill=False):
+        # Drop the result from memory if it can be reloaded, optionally writing it to the local cache first
+        if not self.data_handler.in_memory():
+            return True
+        if spill and not self.data_handler.persisted():
+            self.data_handler.cache_local()
+        if self.data_handler.release():
+            self.result = None
+            return True
+        return False
+
+    async def get_result_async(self):
+        # Waiting and downloading the result happens in a worker thread
+        return await asyncio.to_thread(self.get_result)
     
     def get_params(self):
         # Collect all params from log and combine with params passed to Task()
+        if self.run is None:
+            self.get_run()
         logged_param_strings = self.run.data.params
         for key, val in logged_param_strings.items():
             # Check if we have it
@@ -371,16 +640,148 @@ class Task:
         status = self.get_run().info.status
         print(f"TASK: {self.experiment_name} {status} {self.experiment_id} / {self.run_id}")
         
+    def __log_timings__(self):
+        # Record where the task's time went as run metrics
+        if not self.records_timings:
+            return
+        self.timings["total"] = time.time() - self.start_time
+        log_metrics(self.run_id, timing_metrics(self.timings))
+
     def end_run(self, status="FINISHED"):
+        if self.read_only:
+            # A read-only task never started its run, so there's nothing to end or record
+            return
+        self.__log_timings__()
         #End the run
         mlflow.end_run(status)
         self.print_status()
 
 class Flow(Task):
-    
+
+    def __init__(self, *args, resume=True, max_cpus=None, max_memory=None, memory_budget=None, **kwargs):
+        self.tasks = []
+        self.finished_tasks = {}
+        # Sub tasks are only started while their declared resources fit in the budget
+        self.budget = None
+        if not max_cpus is None or not max_memory is None:
+            self.budget = Resource_Budget(cpus=max_cpus, memory=max_memory)
+        # Bytes of sub task results the Flow keeps in memory
+        self.memory_budget = None if memory_budget is None else parse_memory(memory_budget)
+        super().__init__(*args, **kwargs)
+        # Experiments the sub tasks ran in, so a resumed Flow only searches those
+        self.task_experiment_ids = [experiment_id for experiment_id in self.run.data.tags.get("task_experiments", "").split(",") if experiment_id != ""]
+        # Reopening a Flow by run id reuses the sub tasks that already finished
+        if resume and not kwargs.get("run_id") is None:
+            self.finished_tasks = self.__find_finished_tasks__()
+
+    def __find_finished_tasks__(self):
+        # Finished sub tasks of this Flow's run, by task key
+        experiment_ids = self.task_experiment_ids
+        if len(experiment_ids) == 0:
+            # Flows from before sub task experiments were recorded
+            experiment_ids = search_all_experiment_ids()
+        child_runs = search_all_runs(experiment_ids, filter_string=f"tags.mlflow.parentRunId = '{self.run_id}' and attributes.status = 'FINISHED'")
+        finished_tasks = {}
+        for run in child_runs:
+            if "task_key" in run.data.tags:
+                finished_tasks.setdefault(run.data.tags["task_key"], []).append((run.info.experiment_id, run.info.run_id))
+        return finished_tasks
+
+    def __resume_task__(self, *args, **kwargs):
+        # Reattach to a finished sub task with the same action and params, if there is one
+        if len(self.finished_tasks) == 0:
+            return None
+        bound_args = inspect.signature(Task.__init__).bind(None, *args, **kwargs)
+        action = bound_args.arguments.get("action")
+        if action is None:
+            return None
+        key = task_key(action, bound_args.arguments.get("params", {}))
+        while len(self.finished_tasks.get(key, [])) > 0:
+            experiment_id, run_id = self.finished_tasks[key].pop(0)
+            # Only tasks whose result was cached or logged can be reused
+            data_handler = data_handler_from_path(f"{experiment_id}/{run_id}/result")
+            if not data_handler is None:
+                task = Task.reattach(run_id, data_handler=data_handler)
+                task.print_status()
+                return task
+        return None
+
     def end_flow(self):
+        # Wait for any submitted tasks
+        self.wait_tasks()
+        # Total up where the sub tasks' time went, leaving out those reattached from an earlier run of the Flow
+        log_metrics(self.run_id, rollup_timing_metrics([task.get_run() for task in self.tasks if task.records_timings]))
         #End the run
         self.end_run()
     
+    def __acquire_resources__(self, *args, **kwargs):
+        # Wait until the task's declared resources fit alongside the running sub tasks, and reserve them
+        if self.budget is None:
+            return None
+        bound_args = inspect.signature(Task.__init__).bind(None, *args, **kwargs)
+        return self.budget.acquire(task_resources(bound_args.arguments.get("action"), bound_args.arguments.get("resources")))
+
+    def __release_resources__(self, reservation):
+        if not reservation is None:
+            self.budget.release(reservation)
+
+    def __add_task__(self, task, reservation=None):
+        self.tasks.append(task)
+        if not task.experiment_id in self.task_experiment_ids:
+            self.task_experiment_ids.append(task.experiment_id)
+            set_tags(self.run_id, {"task_experiments": ",".join(self.task_experiment_ids)})
+        if not reservation is None:
+            self.budget.add(task, task.resources, reservation)
+        self.__release_results__()
+
+    def __release_results__(self):
+        # Keep the sub tasks' in-memory results within the memory budget
+        if self.memory_budget is None:
+            return
+        # Results passed to tasks that are still running stay in memory
+        needed = [id(val) for task in self.tasks if not task.done() for val in task.params.values() if isinstance(val, Task)]
+        releasable = [task for task in self.tasks if task.done() and not id(task) in needed and task.data_handler.in_memory()]
+        # Results that can be loaded again don't need to stay in memory
+        for task in releasable:
+            task.release_result()
+        used = sum(task.data_handler.size() for task in self.tasks if task.data_handler.in_memory())
+        # Spill the oldest of the rest to the local cache until back within the budget
+        for task in releasable:
+            if used <= self.memory_budget:
+                break
+            if task.data_handler.in_memory():
+                size = task.data_handler.size()
+                if task.release_result(spill=True):
+                    used -= size
+
     def start_task(self, *args, **kwargs):
-        return Task(*args, **kwargs)
+        reservation = None
+        task = self.__resume_task__(*args, **kwargs)
+        if task is None:
+            reservation = self.__acquire_resources__(*args, **kwargs)
+            try:
+                task = Task(*args, **kwargs)
+            except:
+                self.__release_resources__(reservation)
+                raise
+        self.__add_task__(task, reservation)
+        return task
+
+    async def start_task_async(self, *args, **kwargs):
+        reservation = None
+        # Finding and reattaching a finished task does tracking I/O, which mustn't block the event loop
+        task = await asyncio.to_thread(self.__resume_task__, *args, **kwargs)
+        if task is None:
+            reservation = await asyncio.to_thread(self.__acquire_resources__, *args, **kwargs)
+            try:
+                task = await start_task_async(*args, **kwargs)
+            except:
+                self.__release_resources__(reservation)
+                raise
+        self.__add_task__(task, reservation)
+        return task
+
+    def wait_tasks(self):
+        # Block until all submitted tasks have completed
+        statuses = [task.wait() for task in self.tasks if not task.submitted_run is None]
+        return statuses
@@ -0,0 +1,70 @@
+import io
+import os
+import time
+import pstats
+import cProfile
+import tracemalloc
+from contextlib import contextmanager
+from .data_handlers.utility import cache_dir
+from .client import get_client, log_metrics
+
+profile_modes = {
+    "cpu": (True, False),
+    "memory": (False, True),
+    "all": (True, True),
+    True: (True, True)
+}
+
+# Number of functions and allocation sites in the text reports
+report_limit = 50
+
+@contextmanager
+def profiled_action(task):
+    # Run the task's action under cProfile and/or tracemalloc, depending on task.profile
+    if not task.profile:
+        yield
+        return
+    if not task.profile in profile_modes:
+        raise Exception(f"Invalid task profile {task.profile} (must be one of {list(profile_modes)}).")
+    profile_cpu, profile_memory = profile_modes[task.profile]
+
+    # Leave tracemalloc running if something else started it
+    started_tracemalloc = profile_memory and not tracemalloc.is_tracing()
+    if started_tracemalloc:
+        tracemalloc.start()
+    if profile_memory:
+        tracemalloc.reset_peak()
+    if profile_cpu:
+        profiler = cProfile.Profile()
+    cpu_start = time.process_time()
+    if profile_cpu:
+        profiler.enable()
+    try:
+        yield
+    finally:
+        if profile_cpu:
+            profiler.disable()
+        metrics = {"profile_cpu_time": time.process_time() - cpu_start}
+
+        profile_dir = os.path.join(cache_dir, task.experiment_id, task.run_id, "artifacts", "profile")
+        os.makedirs(profile_dir, exist_ok=True)
+
+        if profile_cpu:
+            profiler.dump_stats(os.path.join(profile_dir, "action.pstats"))
+            report = io.StringIO()
+            pstats.Stats(profiler, stream=report).sort_stats("cumulative").print_stats(report_limit)
+            with open(os.path.join(profile_dir, "action_cpu.txt"), "w") as report_file:
+                report_file.write(report.getvalue())
+
+        if profile_memory:
+            snapshot = tracemalloc.take_snapshot()
+            current_memory, peak_memory = tracemalloc.get_traced_memory()
+            if started_tracemalloc:
+                tracemalloc.stop()
+            metrics["profile_peak_memory"] = peak_memory
+            top_stats = snapshot.statistics("lineno")[:report_limit]
+            with open(os.path.join(profile_dir, "action_memory.txt"), "w") as report_file:
+                report_file.write("\n".join(str(stat) for stat in top_stats))
+
+        log_metrics(task.run_id, metrics)
+        get_client().log_artifacts(task.run_id, profile_dir, "profile")
@@ -0,0 +1,80 @@
+import mlflow
+from concurrent.futures import ThreadPoolExecutor
+from .client import get_client
+from .data_handlers.utility import data_handler_from_path, data_handler_from_cache
+
+def search_all_runs(experiment_ids, filter_string=""):
+    # Every run matching the filter, across result pages
+    mlflow_client = get_client()
+    runs = []
+    page_token = None
+    while True:
+        page = mlflow_client.search_runs(experiment_ids, filter_string=filter_string, page_token=page_token)
+        runs += list(page)
+        page_token = page.token
+        if not page_token:
+            return runs
+
+def search_all_experiment_ids():
+    # Every active experiment's id, across result pages
+    mlflow_client = get_client()
+    experiment_ids = []
+    page_token = None
+    while True:
+        page = mlflow_client.search_experiments(page_token=page_token)
+        experiment_ids += [experiment.experiment_id for experiment in page]
+        page_token = page.token
+        if not page_token:
+            return experiment_ids
+
+def find_runs(experiment_ids, filter_string=""):
+    # (experiment id, run id) for every run matching the filter
+    return [(run.info.experiment_id, run.info.run_id) for run in search_all_runs(experiment_ids, filter_string)]
+
+def load_result(experiment_id, run_id):
+    # Read a task's result through its data handler, without starting its run
+    # Use the local cache's metadata if it's there, to skip the tracking server
+    data_handler = data_handler_from_cache(f"{experiment_id}/{run_id}/result")
+    if data_handler is None:
+        data_handler = data_handler_from_path(f"{experiment_id}/{run_id}/result")
+    if data_handler is None:
+        return None
+    return data_handler.get()
+
+def combine_results(run_ids, results):
+    import pandas
+    found = [result for result in results if not result is None]
+    if len(found) > 0 and all(isinstance(result, pandas.DataFrame) for result in found):
+        # Stack DataFrame results, with the run id as the outer index level
+        frames = {run_id: result for run_id, result in zip(run_ids, results) if not result is None}
+        combined = pandas.concat(frames, names=["run_id"])
+    elif len(found) > 0 and all(isinstance(result, (dict, pandas.Series)) for result in found):
+        # One row per run, one column per key
+        rows = {run_id: dict(result) for run_id, result in zip(run_ids, results) if not result is None}
+        combined = pandas.DataFrame.from_dict(rows, orient="index")
+        combined = combined.reindex(run_ids)
+    else:
+        # One value per run
+        combined = pandas.DataFrame({"result": pandas.Series(results, index=run_ids, dtype=object)})
+        combined["result"] = combined["result"].infer_objects()
+    if combined.index.nlevels == 1:
+        combined.index.name = "run_id"
+    return combined
+
+def load_results(experiment_name=None, experiment_id=None, filter_string="", run_ids=None, max_workers=8):
+    # Load the results of many task runs into one DataFrame indexed by run id
+    # Runs are picked by experiment (and an MLFlow search filter), or given as a list of run ids
+    mlflow_client = get_client()
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        if not run_ids is None:
+            runs = list(pool.map(lambda run_id: (mlflow_client.get_run(run_id).info.experiment_id, run_id), run_ids))
+        else:
+            if experiment_id is None:
+                experiment = mlflow.get_experiment_by_name(experiment_name)
+                if experiment is None:
+                    raise Exception(f"Experiment {experiment_name} not found.")
+                experiment_id = experiment.experiment_id
+            runs = find_runs([experiment_id], filter_string)
+        # Download the results concurrently
+        results = list(pool.map(lambda run: load_result(*run), runs))
+    return combine_results([run_id for experiment_id, run_id in runs], results)
@@ -0,0 +1,159 @@
+import sys
+import time
+import threading
+from contextlib import contextmanager
+from .client import log_metrics
+try:
+    import resource
+except ImportError:
+    # Not available on Windows, resource usage isn't recorded there
+    resource = None
+
+# ru_maxrss is in kilobytes on Linux and bytes on macOS
+maxrss_bytes = 1 if sys.platform == "darwin" else 1024
+
+memory_units = {"B": 1, "KB": 1024, "MB": 1024**2, "GB": 1024**3, "TB": 1024**4}
+
+def parse_memory(memory):
+    # Bytes from a number of bytes or a string like "512MB" or "4GB"
+    if memory is None:
+        return 0
+    if isinstance(memory, str):
+        memory = memory.strip().upper()
+        for unit in sorted(memory_units, key=len, reverse=True):
+            if memory.endswith(unit):
+                return int(float(memory[:-len(unit)]) * memory_units[unit])
+    return int(memory)
+
+def task_resources(action=None, resources=None):
+    # The resources a task declares, with defaults: one core, no memory reservation,
+    # and notebook and project tasks running exclusively
+    if resources is None:
+        resources = {}
+    exclusive_action = isinstance(action, tuple) or (isinstance(action, str) and action[-6:] == ".ipynb")
+    return {
+        "cpus": float(resources.get("cpus", 1)),
+        "memory": parse_memory(resources.get("memory")),
+        "exclusive": bool(resources.get("exclusive", exclusive_action))
+    }
+
+class Reservation:
+    # Holds a task's resources in the budget until the started task takes its place
+    def done(self):
+        return False
+
+class Resource_Budget:
+    # Admits tasks while their declared resources fit in the machine's budget
+    def __init__(self, cpus=None, memory=None, poll_interval=0.5):
+        self.cpus = cpus
+        self.memory = None if memory is None else parse_memory(memory)
+        self.poll_interval = poll_interval
+        # (task or reservation, resources) for tasks that may still be running
+        self.running = []
+        # Tasks may be started from several threads
+        self.lock = threading.RLock()
+
+    def fits(self, resources):
+        if len(self.running) == 0:
+            # Always admit a task on its own, even if it declares more than the budget
+            return True
+        if resources["exclusive"] or any(running_resources["exclusive"] for task, running_resources in self.running):
+            return False
+        if not self.cpus is None and sum(r["cpus"] for t, r in self.running) + resources["cpus"] > self.cpus:
+            return False
+        if not self.memory is None and sum(r["memory"] for t, r in self.running) + resources["memory"] > self.memory:
+            return False
+        return True
+
+    def release_finished(self):
+        with self.lock:
+            self.running = [(task, resources) for task, resources in self.running if not task.done()]
+
+    def acquire(self, resources):
+        # Block until the resources fit alongside the running tasks, and reserve them
+        while True:
+            with self.lock:
+                self.release_finished()
+                if self.fits(resources):
+                    reservation = Reservation()
+                    self.running.append((reservation, resources))
+                    return reservation
+            time.sleep(self.poll_interval)
+
+    def release(self, reservation):
+        # Give back reserved resources, e.g. if the task failed to start
+        with self.lock:
+            self.running = [(task, resources) for task, resources in self.running if not task is reservation]
+
+    def add(self, task, resources, reservation=None):
+        # Track a started task, in place of its reservation
+        with self.lock:
+            if not reservation is None:
+                self.release(reservation)
+            self.running.append((task, resources))
+
+def proc_status_bytes(field):
+    # A memory size from Linux /proc/self/status in bytes, or None elsewhere
+    try:
+        with open("/proc/self/status") as status_file:
+            for line in status_file:
+                if line.startswith(field + ":"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return None
+
+def peak_rss():
+    # Peak resident memory of this process in bytes, from Linux /proc, or getrusage elsewhere
+    peak = proc_status_bytes("VmHWM")
+    if peak is None:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * maxrss_bytes
+    return peak
+
+def current_rss():
+    # Resident memory of this process in bytes, only known on Linux
+    return proc_status_bytes("VmRSS")
+
+def reset_peak_rss():
+    # Linux lets a process reset its peak resident memory, so the peak covers only the action
+    # Returns whether it could
+    try:
+        with open("/proc/self/clear_refs", "w") as clear_refs:
+            clear_refs.write("5")
+        return True
+    except OSError:
+        return False
+
+@contextmanager
+def measured_usage(task):
+    # Record the CPU time and peak memory used by the task's action, including child processes, as run metrics
+    if resource is None:
+        yield
+        return
+    # The process may be an orchestrator holding other data, so only memory added by the action counts
+    peak_was_reset = reset_peak_rss()
+    rss_start = current_rss()
+    peak_start = peak_rss()
+    self_start = resource.getrusage(resource.RUSAGE_SELF)
+    children_start = resource.getrusage(resource.RUSAGE_CHILDREN)
+    try:
+        yield
+    finally:
+        self_end = resource.getrusage(resource.RUSAGE_SELF)
+        children_end = resource.getrusage(resource.RUSAGE_CHILDREN)
+        cpu_time = (self_end.ru_utime + self_end.ru_stime - self_start.ru_utime - self_start.ru_stime) + (children_end.ru_utime + children_end.ru_stime - children_start.ru_utime - children_start.ru_stime)
+        # Child peaks are only known for the largest child process ever waited on
+        children_peak = children_end.ru_maxrss * maxrss_bytes if children_end.ru_maxrss > children_start.ru_maxrss else 0
+        peak_end = peak_rss()
+        if rss_start is None:
+            # Without the current size, only a new process peak says how much the action added
+            rss_start = peak_start
+        if peak_was_reset or peak_end > peak_start:
+            action_peak = max(0, peak_end - rss_start)
+        else:
+            # Below an earlier peak of the process, the action's own peak isn't known
+            action_peak = 0
+        log_metrics(task.run_id, {
+            "resource_cpu_time": cpu_time,
+            "resource_peak_memory": max(action_peak, children_peak)
+        })
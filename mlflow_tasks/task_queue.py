@@ -0,0 +1,278 @@
+import os
+import json
+import time
+import uuid
+import socket
+import sqlite3
+import argparse
+import importlib
+import threading
+import mlflow
+from typing import Callable
+from mlflow.entities import RunStatus
+from .client import get_client
+from .data_handlers.utility import data_handler_from_path
+
+# A durable task queue in a SQLite file, so tasks can be run by worker processes on this or other hosts
+# Workers need access to the queue file, the tracking store, and the task's code
+#
+# Submit tasks from a flow:
+#   queue = Task_Queue("tasks.db")
+#   task = flow.start_task(my_func, x=8, executor=queue, synchronous=False)
+# Run workers:
+#   python -m mlflow_tasks.task_queue tasks.db
+
+finished_statuses = [RunStatus.to_string(RunStatus.FINISHED), RunStatus.to_string(RunStatus.FAILED), RunStatus.to_string(RunStatus.KILLED)]
+
+class Task_Queue:
+    def __init__(self, path, lease_seconds=60, max_attempts=3):
+        self.path = os.path.abspath(path)
+        # Seconds a worker holds a task without renewing before another worker may take it over
+        self.lease_seconds = lease_seconds
+        # Times a task is claimed before it is given up on
+        self.max_attempts = max_attempts
+        with self.connect() as connection:
+            connection.execute("""
+                CREATE TABLE IF NOT EXISTS tasks (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    descriptor TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    worker_id TEXT,
+                    lease_expires REAL,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    submitted REAL NOT NULL,
+                    updated REAL NOT NULL
+                )
+            """)
+
+    def connect(self):
+        connection = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        connection.execute("PRAGMA journal_mode=WAL")
+        return Queue_Connection(connection)
+
+    def submit(self, descriptor):
+        now = time.time()
+        with self.connect() as connection:
+            cursor = connection.execute(
+                "INSERT INTO tasks (descriptor, status, submitted, updated) VALUES (?, ?, ?, ?)",
+                (json.dumps(descriptor), RunStatus.to_string(RunStatus.SCHEDULED), now, now)
+            )
+            return cursor.lastrowid
+
+    def claim(self, worker_id):
+        # Take the oldest waiting task, or one whose worker stopped renewing its lease
+        now = time.time()
+        with self.connect() as connection:
+            connection.execute("BEGIN IMMEDIATE")
+            try:
+                # Give up on tasks whose leases ran out too many times
+                expired = connection.execute(
+                    "SELECT id, descriptor FROM tasks WHERE status = ? AND lease_expires < ? AND attempts >= ?",
+                    (RunStatus.to_string(RunStatus.RUNNING), now, self.max_attempts)
+                ).fetchall()
+                for task_id, descriptor in expired:
+                    connection.execute("UPDATE tasks SET status = ?, updated = ? WHERE id = ?", (RunStatus.to_string(RunStatus.FAILED), now, task_id))
+                row = connection.execute(
+                    "SELECT id, descriptor FROM tasks WHERE status = ? OR (status = ? AND lease_expires < ?) ORDER BY id LIMIT 1",
+                    (RunStatus.to_string(RunStatus.SCHEDULED), RunStatus.to_string(RunStatus.RUNNING), now)
+                ).fetchone()
+                if not row is None:
+                    connection.execute(
+                        "UPDATE tasks SET status = ?, worker_id = ?, lease_expires = ?, attempts = attempts + 1, updated = ? WHERE id = ?",
+                        (RunStatus.to_string(RunStatus.RUNNING), worker_id, now + self.lease_seconds, now, row[0])
+                    )
+                connection.execute("COMMIT")
+            except Exception:
+                connection.execute("ROLLBACK")
+                raise
+        for task_id, descriptor in expired:
+            fail_run(json.loads(descriptor))
+        if row is None:
+            return None
+        return (row[0], json.loads(row[1]))
+
+    def renew(self, task_id, worker_id):
+        # Extend the lease, returns False if the task was taken over by another worker
+        now = time.time()
+        with self.connect() as connection:
+            cursor = connection.execute(
+                "UPDATE tasks SET lease_expires = ?, updated = ? WHERE id = ? AND worker_id = ? AND status = ?",
+                (now + self.lease_seconds, now, task_id, worker_id, RunStatus.to_string(RunStatus.RUNNING))
+            )
+            return cursor.rowcount == 1
+
+    def complete(self, task_id, worker_id, status):
+        with self.connect() as connection:
+            connection.execute(
+                "UPDATE tasks SET status = ?, lease_expires = NULL, updated = ? WHERE id = ? AND worker_id = ?",
+                (status, time.time(), task_id, worker_id)
+            )
+
+    def cancel(self, task_id):
+        # Only tasks no worker has claimed yet can be cancelled
+        with self.connect() as connection:
+            connection.execute(
+                "UPDATE tasks SET status = ?, updated = ? WHERE id = ? AND status = ?",
+                (RunStatus.to_string(RunStatus.KILLED), time.time(), task_id, RunStatus.to_string(RunStatus.SCHEDULED))
+            )
+
+    def get_status(self, task_id):
+        with self.connect() as connection:
+            row = connection.execute("SELECT status FROM tasks WHERE id = ?", (task_id,)).fetchone()
+        return None if row is None else row[0]
+
+class Queue_Connection:
+    # Closes the SQLite connection when used as a context manager
+    def __init__(self, connection):
+        self.connection = connection
+
+    def execute(self, *args):
+        return self.connection.execute(*args)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, type, value, traceback):
+        self.connection.close()
+
+class Queue_Submitted_Run:
+    # A task submitted to a Task_Queue, with the same interface as MLFlow's SubmittedRun for project runs
+    def __init__(self, queue, task_id, run_id, poll_interval=1):
+        self.queue = queue
+        self.task_id = task_id
+        self._run_id = run_id
+        self.poll_interval = poll_interval
+
+    @property
+    def run_id(self):
+        return self._run_id
+
+    def wait(self):
+        while not self.get_status() in finished_statuses:
+            time.sleep(self.poll_interval)
+        return self.get_status() == RunStatus.to_string(RunStatus.FINISHED)
+
+    def get_status(self):
+        return self.queue.get_status(self.task_id)
+
+    def cancel(self):
+        self.queue.cancel(self.task_id)
+        if self.get_status() == RunStatus.to_string(RunStatus.KILLED):
+            fail_run({"run_id": self.run_id, "tracking_uri": mlflow.get_tracking_uri()}, RunStatus.to_string(RunStatus.KILLED))
+
+def describe_action(action):
+    # A JSON-serializable description of the action that a worker can load again
+    if isinstance(action, Callable):
+        if action.__module__ == "__main__" or "<" in action.__qualname__:
+            raise Exception(f"Task function {action.__qualname__} must be importable by module and name to be queued.")
+        return {"type": "function", "module": action.__module__, "name": action.__qualname__}
+    elif isinstance(action, str):
+        if action[-3:] == ".py" or action[-6:] == ".ipynb":
+            return {"type": "path", "path": os.path.abspath(action)}
+        return {"type": "uri", "uri": action}
+    elif isinstance(action, tuple):
+        project_uri = action[0]
+        if os.path.exists(project_uri):
+            project_uri = os.path.abspath(project_uri)
+        return {"type": "project", "uri": project_uri, "entry_point": action[1] if len(action) > 1 else "main"}
+    raise Exception("Invalid task action type (not a function or string).")
+
+def load_action(action_descriptor):
+    action_type = action_descriptor["type"]
+    if action_type == "function":
+        action = importlib.import_module(action_descriptor["module"])
+        for name in action_descriptor["name"].split("."):
+            action = getattr(action, name)
+        return action
+    elif action_type == "path":
+        return action_descriptor["path"]
+    elif action_type == "uri":
+        return action_descriptor["uri"]
+    elif action_type == "project":
+        return (action_descriptor["uri"], action_descriptor["entry_point"])
+    raise Exception(f"Invalid queued action type {action_type}.")
+
+def fail_run(descriptor, status=RunStatus.to_string(RunStatus.FAILED)):
+    get_client(descriptor["tracking_uri"]).set_terminated(descriptor["run_id"], status)
+
+def load_params(params):
+    # Load logged params back from their data handlers
+    loaded_params = {}
+    for key, val in params.items():
+        param_handler = data_handler_from_path(val)
+        if param_handler is None:
+            loaded_params[key] = val
+        else:
+            loaded_params[key] = param_handler.get()
+    return loaded_params
+
+class Task_Worker:
+    def __init__(self, queue, worker_id=None, poll_interval=1):
+        self.queue = queue
+        if worker_id is None:
+            worker_id = f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self.worker_id = worker_id
+        self.poll_interval = poll_interval
+
+    def run(self, max_tasks=None, stop_when_empty=False):
+        # Claim and execute tasks until stopped
+        tasks_run = 0
+        while max_tasks is None or tasks_run < max_tasks:
+            claimed = self.queue.claim(self.worker_id)
+            if claimed is None:
+                if stop_when_empty:
+                    break
+                time.sleep(self.poll_interval)
+                continue
+            task_id, descriptor = claimed
+            self.execute(task_id, descriptor)
+            tasks_run += 1
+        return tasks_run
+
+    def execute(self, task_id, descriptor):
+        from .mlflow_tasks import Task
+
+        # Renew the lease while the task runs
+        stop_renewing = threading.Event()
+        def renew_lease():
+            while not stop_renewing.wait(self.queue.lease_seconds / 3):
+                if not self.queue.renew(task_id, self.worker_id):
+                    break
+        renewer = threading.Thread(target=renew_lease, daemon=True)
+        renewer.start()
+
+        end_status = RunStatus.to_string(RunStatus.FAILED)
+        try:
+            mlflow.set_tracking_uri(descriptor["tracking_uri"])
+            # Reattach to the task's run and execute it with the Task engines
+            action = load_action(descriptor["action"])
+            task = Task(action, run_id=descriptor["run_id"], experiment_id=descriptor["experiment_id"], logged_params=descriptor["params"], **load_params(descriptor["params"]))
+            end_status = task.get_run().info.status
+        except Exception as e:
+            print(f"TASK QUEUE: task {task_id} (run {descriptor['run_id']}) failed: {e!r}")
+            # End the run if the Task didn't get to
+            while not mlflow.active_run() is None:
+                mlflow.end_run(end_status)
+        finally:
+            stop_renewing.set()
+            renewer.join()
+        self.queue.complete(task_id, self.worker_id, end_status)
+        return end_status
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run mlflow_tasks queue workers.")
+    parser.add_argument("queue_path", help="Path to the SQLite queue file")
+    parser.add_argument("--lease-seconds", type=int, default=60)
+    parser.add_argument("--max-attempts", type=int, default=3)
+    parser.add_argument("--poll-interval", type=float, default=1)
+    parser.add_argument("--max-tasks", type=int, default=None, help="Stop after this many tasks")
+    parser.add_argument("--stop-when-empty", action="store_true", help="Stop when there are no tasks waiting")
+    args = parser.parse_args(argv)
+
+    queue = Task_Queue(args.queue_path, lease_seconds=args.lease_seconds, max_attempts=args.max_attempts)
+    worker = Task_Worker(queue, poll_interval=args.poll_interval)
+    print(f"TASK QUEUE: worker {worker.worker_id} running tasks from {queue.path}")
+    worker.run(max_tasks=args.max_tasks, stop_when_empty=args.stop_when_empty)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,32 @@
+import time
+from contextlib import contextmanager
+
+# Callables run after each timed phase of a task, as hook(task, phase, start_time, end_time)
+# Times are epoch seconds, so an external tracer can record each phase as a span
+phase_hooks = []
+
+metric_prefix = "time_"
+
+@contextmanager
+def timed_phase(task, phase):
+    start_time = time.time()
+    try:
+        yield
+    finally:
+        end_time = time.time()
+        # Phases can run more than once per task, e.g. caching several params
+        task.timings[phase] = task.timings.get(phase, 0) + (end_time - start_time)
+        for hook in phase_hooks:
+            hook(task, phase, start_time, end_time)
+
+def timing_metrics(timings):
+    return {metric_prefix + phase: seconds for phase, seconds in timings.items()}
+
+def rollup_timing_metrics(runs):
+    # Sum the phase timings logged on each run
+    totals = {}
+    for run in runs:
+        for key, seconds in run.data.metrics.items():
+            if key.startswith(metric_prefix):
+                totals[key] = totals.get(key, 0) + seconds
+    return {"tasks_" + key: seconds for key, seconds in totals.items()}
@@ -88,4 +88,12 @@ def test_pass_cached_reloaded_task():
         return foo
     t2 = mlflow_tasks.Task(x, foo=t, experiment_name="test_pass_cached_reloaded_task_2")
     t2.end_run()
-    assert [1,2,3] == t2.get_result()
\ No newline at end of file
+    assert [1,2,3] == t2.get_result()
+
+def test_task_global_cache_dir(tmp_path, monkeypatch):
+    monkeypatch.setenv("MLFLOW_TASKS_GLOBAL_CACHE_DIR", str(tmp_path))
+    t = mlflow_tasks.Task(lambda: [1,2,3], write_global_cache=True, experiment_name="test_task_global_cache_dir")
+    # The handler is found from the global cache's metadata
+    handler = mlflow_tasks.data_handlers.data_handler_from_path(f"{t.experiment_id}/{t.run_id}/result")
+    assert handler.global_cache_dir == str(tmp_path)
+    assert handler.get() == [1,2,3]
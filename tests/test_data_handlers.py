@@ -85,3 +85,82 @@ def test_data_handler_log():
     # Re-load the data
     dh2.register(run.info.experiment_id, run.info.run_id, "test/foo")
     assert dh2.get() == dataset
+
+def test_data_handler_skips_clean_writes():
+    dh = data_handlers.Py_Obj_Handler()
+    run = mlflow.start_run()
+    dh.register(run.info.experiment_id, run.info.run_id, "test/foo")
+    dh.set([1,2,3,5])
+    mlflow.end_run()
+    dh.log()
+    # Nothing changed, so these don't write again
+    dh.cache_local()
+    dh.log()
+    assert dh.skipped_writes == 2
+    assert dh.avoided_bytes == 2 * os.path.getsize(dh.local_cache_uri)
+    # New data is written again
+    dh.set([6])
+    dh.cache_local()
+    assert dh.skipped_writes == 2
+    dh2 = data_handlers.Py_Obj_Handler()
+    dh2.register(run.info.experiment_id, run.info.run_id, "test/foo")
+    assert dh2.get() == [6]
+
+def test_data_handler_counts_only_requested_writes():
+    dh = data_handlers.Py_Obj_Handler()
+    run = mlflow.start_run()
+    dh.register(run.info.experiment_id, run.info.run_id, "test/foo")
+    dh.set([1,2,3,5])
+    mlflow.end_run()
+    # As set_result does with several write flags, nothing was asked for twice
+    dh.cache_local()
+    dh.log()
+    dh.cache_global()
+    assert dh.skipped_writes == 0
+    assert dh.avoided_bytes == 0
+
+def test_data_handler_global_cache_dir(tmp_path):
+    global_cache_dir = str(tmp_path / "global")
+    dh = data_handlers.Py_Obj_Handler(global_cache_dir=global_cache_dir)
+    run = mlflow.start_run()
+    dh.register(run.info.experiment_id, run.info.run_id, "test/foo")
+    dh.set([1,2,3,5])
+    mlflow.end_run()
+    dh.cache_global()
+    # Nothing was logged to the run
+    assert mlflow_client.list_artifacts(run.info.run_id, "test/foo") == []
+    # Another node, with its own local cache
+    dh2 = data_handlers.Py_Obj_Handler(cache_dir=str(tmp_path / "node2"), global_cache_dir=global_cache_dir)
+    dh2.register(run.info.experiment_id, run.info.run_id, "test/foo")
+    assert dh2.get() == [1,2,3,5]
+    assert os.path.exists(dh2.local_cache_uri)
+
+def test_data_handler_global_cache_other_node(tmp_path, monkeypatch):
+    from mlflow_tasks.data_handlers.utility import data_handler_from_path, data_handler_from_cache
+    global_cache_dir = str(tmp_path / "global")
+    monkeypatch.setenv("MLFLOW_TASKS_GLOBAL_CACHE_DIR", global_cache_dir)
+    # Written by a node whose local cache path doesn't exist on this one
+    (tmp_path / "not_a_dir").write_text("")
+    dh = data_handlers.Py_Obj_Handler(cache_dir=str(tmp_path / "not_a_dir" / "cache"))
+    run = mlflow.start_run()
+    dh.register(run.info.experiment_id, run.info.run_id, "test/foo")
+    dh.set([1,2,3,5])
+    mlflow.end_run()
+    dh.cache_global()
+    # The reader uses its own local cache
+    dh2 = data_handler_from_path(dh.full_path)
+    assert dh2.cache_dir != dh.cache_dir
+    assert dh2.get() == [1,2,3,5]
+    assert data_handler_from_cache(dh.full_path, dh2.cache_dir).get() == [1,2,3,5]
+    # A local cache that can't be written to still reads from the global cache
+    dh3 = data_handlers.Py_Obj_Handler(cache_dir=str(tmp_path / "not_a_dir" / "cache"))
+    dh3.register(run.info.experiment_id, run.info.run_id, "test/foo")
+    assert dh3.get() == [1,2,3,5]
+
+def test_data_size():
+    import pickle
+    import numpy
+    from mlflow_tasks.data_handlers.py_obj_handler import data_size
+    payload = {"a": [1,2,3], "b": b"x" * 10_000}
+    assert data_size(payload) == len(pickle.dumps(payload))
+    assert data_size(numpy.zeros(100)) == 800
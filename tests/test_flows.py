@@ -1,4 +1,5 @@
 # +
+import asyncio
 import os
 import sys
 
@@ -37,4 +38,164 @@ def test_create_subtask():
     subtask = flow.start_task(experiment_name="SubTask Test Experiment")
     assert isinstance(subtask, mlflow_tasks.Task)
     subtask.end_run()
-    flow.end_flow()
\ No newline at end of file
+    flow.end_flow()
+
+def test_flow_tracks_subtasks():
+    flow = mlflow_tasks.Flow(experiment_name="Flow Test Experiment")
+    subtask = flow.start_task(lambda x: x*2, x=4, experiment_name="SubTask Test Experiment")
+    assert flow.tasks == [subtask]
+    assert subtask.done()
+    flow.end_flow()
+    assert subtask.get_result() == 8
+
+def test_flow_timing_rollup():
+    flow = mlflow_tasks.Flow(experiment_name="Flow Test Experiment")
+    flow.start_task(lambda x: x*2, x=4, experiment_name="SubTask Test Experiment")
+    flow.start_task(lambda x: x*3, x=4, experiment_name="SubTask Test Experiment")
+    flow.end_flow()
+    metrics = flow.get_run().data.metrics
+    assert "tasks_time_action" in metrics
+    assert metrics["tasks_time_total"] >= metrics["tasks_time_action"]
+
+fail_step = {"fail": True}
+
+def flaky_step(x):
+    if fail_step["fail"]:
+        raise ValueError("step failed")
+    return x + 1
+
+def test_resume_flow():
+    def first_step(x):
+        return x * 2
+    def last_step(x):
+        return x * 10
+    fail_step["fail"] = True
+    flow = mlflow_tasks.Flow(experiment_name="Flow Resume Test Experiment")
+    task1 = flow.start_task(first_step, x=1, write_local_cache=True, experiment_name="SubTask Resume Test Experiment")
+    try:
+        flow.start_task(flaky_step, x=task1, experiment_name="SubTask Resume Test Experiment")
+    except ValueError:
+        # End the failed sub task and the flow
+        mlflow.end_run("FAILED")
+        flow.end_run("FAILED")
+
+    # Re-run the flow
+    fail_step["fail"] = False
+    flow = mlflow_tasks.Flow(run_id=flow.run_id)
+    resumed1 = flow.start_task(first_step, x=1, write_local_cache=True, experiment_name="SubTask Resume Test Experiment")
+    resumed2 = flow.start_task(flaky_step, x=resumed1, experiment_name="SubTask Resume Test Experiment")
+    resumed3 = flow.start_task(last_step, x=resumed2, experiment_name="SubTask Resume Test Experiment")
+    flow.end_flow()
+    assert resumed1.run_id == task1.run_id
+    assert resumed3.get_result() == 30
+    assert flow.get_run().info.status == "FINISHED"
+
+def test_resume_flow_lambdas():
+    # Functions with the same name and params are told apart by their code
+    flow = mlflow_tasks.Flow(experiment_name="Flow Resume Test Experiment")
+    task1 = flow.start_task(lambda x: x*2, x=4, write_local_cache=True, experiment_name="SubTask Resume Test Experiment")
+    task2 = flow.start_task(lambda x: x*3, x=4, write_local_cache=True, experiment_name="SubTask Resume Test Experiment")
+    flow.end_flow()
+    tasks_time_total = flow.get_run().data.metrics["tasks_time_total"]
+
+    flow = mlflow_tasks.Flow(run_id=flow.run_id)
+    resumed1 = flow.start_task(lambda x: x*2, x=4, write_local_cache=True, experiment_name="SubTask Resume Test Experiment")
+    resumed2 = flow.start_task(lambda x: x*3, x=4, write_local_cache=True, experiment_name="SubTask Resume Test Experiment")
+    flow.end_flow()
+    assert [resumed1.run_id, resumed2.run_id] == [task1.run_id, task2.run_id]
+    assert [resumed1.get_result(), resumed2.get_result()] == [8, 12]
+    # Reattached tasks' timings aren't added to the rollup again
+    assert flow.get_run().data.metrics["tasks_time_total"] == tasks_time_total
+
+def double(x):
+    return x*2
+
+def test_resume_flow_async():
+    flow = mlflow_tasks.Flow(experiment_name="Flow Resume Test Experiment")
+    task = flow.start_task(double, x=5, write_local_cache=True, experiment_name="SubTask Resume Test Experiment")
+    flow.end_flow()
+    assert flow.get_run().data.tags["task_experiments"] == task.experiment_id
+
+    async def resume():
+        flow = mlflow_tasks.Flow(run_id=task.get_run().data.tags["mlflow.parentRunId"])
+        resumed = await flow.start_task_async(double, x=5, write_local_cache=True, experiment_name="SubTask Resume Test Experiment")
+        flow.end_flow()
+        return resumed
+    resumed = asyncio.run(resume())
+    assert resumed.run_id == task.run_id
+    assert resumed.get_result() == 10
+
+def test_flow_resource_budget():
+    flow = mlflow_tasks.Flow(experiment_name="Flow Test Experiment", max_cpus=2, max_memory="1GB")
+    tasks = [flow.start_task(lambda x: x*2, x=i, resources={"cpus": 1, "memory": "256MB"}, experiment_name="SubTask Test Experiment") for i in range(3)]
+    flow.end_flow()
+    assert [t.get_result() for t in tasks] == [0, 2, 4]
+    run = tasks[0].get_run()
+    assert run.data.tags["resources.memory"] == str(256 * 1024**2)
+    assert "resource_peak_memory" in run.data.metrics
+    assert "resource_cpu_time" in run.data.metrics
+
+def allocate(mb):
+    # Touch every page, so the memory is resident
+    data = b"x" * (mb * 1024**2)
+    return len(data)
+
+def test_flow_resource_usage():
+    # The orchestrator's own memory isn't counted as the task's
+    ballast = b"x" * (200 * 1024**2)
+    flow = mlflow_tasks.Flow(experiment_name="Flow Test Experiment")
+    small = flow.start_task(allocate, mb=0, experiment_name="SubTask Test Experiment")
+    large = flow.start_task(allocate, mb=64, experiment_name="SubTask Test Experiment")
+    flow.end_flow()
+    assert small.get_run().data.metrics["resource_peak_memory"] < 32 * 1024**2
+    assert 48 * 1024**2 < large.get_run().data.metrics["resource_peak_memory"] < 128 * 1024**2
+    del ballast
+
+def test_resource_budget_packing():
+    from mlflow_tasks.scheduling import Resource_Budget, task_resources
+    class Running:
+        def done(self):
+            return False
+    budget = Resource_Budget(cpus=4, memory="8GB")
+    budget.add(Running(), task_resources(resources={"cpus": 2, "memory": "4GB"}))
+    assert budget.fits(task_resources(resources={"cpus": 2, "memory": "4GB"}))
+    assert not budget.fits(task_resources(resources={"cpus": 3}))
+    assert not budget.fits(task_resources(resources={"memory": "5GB"}))
+    # Notebooks and projects run on their own by default
+    assert not budget.fits(task_resources("my_notebook.ipynb"))
+
+def test_resource_budget_reserves():
+    import threading
+    from mlflow_tasks.scheduling import Resource_Budget, task_resources
+    budget = Resource_Budget(cpus=1, poll_interval=0.05)
+    reservation = budget.acquire(task_resources())
+    # A second task waits for the reserved cpu, even before the first task is added
+    acquired = threading.Event()
+    waiting = threading.Thread(target=lambda: acquired.set() if budget.acquire(task_resources()) else None)
+    waiting.start()
+    assert not acquired.wait(0.3)
+    budget.release(reservation)
+    assert acquired.wait(5)
+    waiting.join()
+
+def make_payload(i):
+    return bytes([i]) * 10_000
+
+def test_flow_memory_budget():
+    flow = mlflow_tasks.Flow(experiment_name="test_flow_memory_budget", memory_budget="15KB")
+    tasks = [flow.start_task(make_payload, i=i, experiment_name="test_flow_memory_budget_task") for i in range(4)]
+    # Only the newest result fits, the rest were spilled to the local cache
+    assert [task.data_handler.in_memory() for task in tasks] == [False, False, False, True]
+    assert all(task.data_handler.persisted() for task in tasks[:3])
+    assert tasks[0].get_result() == make_payload(0)
+    flow.end_flow()
+
+def test_flow_memory_budget_releases_persisted():
+    flow = mlflow_tasks.Flow(experiment_name="test_flow_memory_budget_releases_persisted", memory_budget="1GB")
+    cached = flow.start_task(make_payload, i=1, write_local_cache=True, experiment_name="test_flow_memory_budget_task")
+    uncached = flow.start_task(make_payload, i=2, experiment_name="test_flow_memory_budget_task")
+    # Cached results can be reloaded, so they're dropped even within the budget
+    assert not cached.data_handler.in_memory()
+    assert uncached.data_handler.in_memory()
+    assert cached.get_result() == make_payload(1)
+    flow.end_flow()
@@ -0,0 +1,69 @@
+# +
+import os
+import sys
+
+# Add the folder that contains this script to PYTHONPATH so that mlflow_tasks can be imported
+try:
+    #__file__
+    sys.path.append(os.path.dirname(os.path.realpath(__file__)))
+    project_folder = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+except:
+    project_folder = os.path.split(os.path.abspath(''))[0]
+
+sys.path.insert(0, project_folder)
+
+import mlflow
+import mlflow_tasks
+from mlflow_tasks.task_queue import Task_Queue, Task_Worker
+
+# +
+def add(x, y):
+    return x + y
+
+def test_queue_run_task(tmp_path):
+    queue = Task_Queue(str(tmp_path / "tasks.db"))
+    task = mlflow_tasks.Task(add, x=1, y=2, executor=queue, synchronous=False, experiment_name="test_queue_run_task")
+    assert task.get_run().info.status == "SCHEDULED"
+    assert not task.done()
+    assert Task_Worker(queue).run(stop_when_empty=True) == 1
+    assert task.wait() == "FINISHED"
+    assert task.get_result() == 3
+
+def test_queue_data_handler(tmp_path):
+    queue = Task_Queue(str(tmp_path / "tasks.db"))
+    handler = mlflow_tasks.data_handlers.Py_Obj_Handler(global_cache_dir=str(tmp_path / "global"))
+    task = mlflow_tasks.Task(add, x=1, y=2, executor=queue, data_handler=handler, synchronous=False, experiment_name="test_queue_run_task")
+    assert Task_Worker(queue).run(stop_when_empty=True) == 1
+    assert task.wait() == "FINISHED"
+    worker_handler = mlflow_tasks.data_handlers.data_handler_from_path(f"{task.experiment_id}/{task.run_id}/result")
+    assert worker_handler.global_cache_dir == str(tmp_path / "global")
+    assert task.get_result() == 3
+
+def test_queue_flow(tmp_path):
+    queue = Task_Queue(str(tmp_path / "tasks.db"))
+    flow = mlflow_tasks.Flow(experiment_name="test_queue_flow")
+    task1 = flow.start_task(add, x=1, y=2, executor=queue, synchronous=False, experiment_name="test_queue_flow_task")
+    assert Task_Worker(queue).run(stop_when_empty=True) == 1
+    task2 = flow.start_task(add, x=task1, y=10, executor=queue, synchronous=False, experiment_name="test_queue_flow_task")
+    assert Task_Worker(queue).run(stop_when_empty=True) == 1
+    flow.end_flow()
+    assert task2.get_result() == 13
+    # The worker keeps the key the task was submitted with, so a resumed Flow can reattach it
+    assert task2.get_run().data.tags["task_key"] == mlflow_tasks.mlflow_tasks.task_key(add, {"x": task1, "y": 10})
+
+def test_queue_lease_expiry(tmp_path):
+    queue = Task_Queue(str(tmp_path / "tasks.db"), lease_seconds=0, max_attempts=2)
+    task_id = queue.submit({"run_id": "abc", "tracking_uri": mlflow.get_tracking_uri()})
+    # A worker claims the task and crashes
+    assert queue.claim("crashed_worker")[0] == task_id
+    # Its lease runs out and another worker takes the task over
+    assert queue.claim("other_worker")[0] == task_id
+    assert not queue.renew(task_id, "crashed_worker")
+
+def test_queue_rejects_lambda(tmp_path):
+    from mlflow_tasks.task_queue import describe_action
+    try:
+        describe_action(lambda x: x)
+        assert False
+    except Exception as e:
+        assert "importable" in str(e)
@@ -14,6 +14,7 @@ sys.path.insert(0, project_folder)
 
 import mlflow_tasks
 import mlflow
+import pytest
 
 
 # +
@@ -102,6 +103,31 @@ def test_task_exec_model():
     task2.end_run()
     assert res.equals(pd.DataFrame([range(10)]) + 5)
 
+def test_task_exec_model_batched():
+    task1 = mlflow_tasks.Task(experiment_name="test_task_exec_model_batched_1")
+    # Define model
+    my_model = AddN(n=5)
+    # Save model
+    mlflow.pyfunc.log_model("my_model", python_model=my_model)
+    model_uri = mlflow.get_artifact_uri("my_model")
+    task1.end_run()
+    # Create input
+    import pandas as pd
+    model_input = pd.DataFrame([range(10)] * 7)
+    # Create task, scoring 3 rows at a time on 2 workers
+    task2 = mlflow_tasks.Task(model_uri, model_input=model_input, batch_size=3, workers=2, experiment_name="test_task_exec_model_batched_2")
+    res = task2.get_result()
+    assert res.equals(model_input + 5)
+
+def test_batch_split_combine():
+    import numpy as np
+    from mlflow_tasks.batch import split_input, combine_predictions
+    arr = np.arange(10)
+    chunks = list(split_input(arr, 4))
+    assert [len(c) for c in chunks] == [4, 4, 2]
+    assert (combine_predictions(chunks) == arr).all()
+    assert combine_predictions(list(split_input(list(range(5)), 2))) == [0, 1, 2, 3, 4]
+
 def test_task_exec_nb():
     task = mlflow_tasks.Task("tests/notebook.ipynb", test_param=8, experiment_name="test_task_exec_nb")
     res = task.get_result()
@@ -128,4 +154,109 @@ def test_task_input_to_model():
 def test_task_exec_project():
     task = mlflow_tasks.Task(("tests/project", "main"), test_param=8, experiment_name="test_task_exec_project")
     res = task.get_result()
-    assert res == 16
\ No newline at end of file
+    assert res == 16
+
+def test_task_exec_project_async():
+    task = mlflow_tasks.Task(("tests/project", "main"), test_param=8, synchronous=False, experiment_name="test_task_exec_project_async")
+    assert task.submitted_run is not None
+    assert task.wait() == "FINISHED"
+    res = task.get_result()
+    assert res == 16
+
+def test_task_async():
+    import asyncio
+    async def run_tasks():
+        tasks = await asyncio.gather(*[mlflow_tasks.start_task_async(lambda x: x*2, x=i, experiment_name="test_task_async") for i in range(3)])
+        return await asyncio.gather(*[t.get_result_async() for t in tasks])
+    assert asyncio.run(run_tasks()) == [0, 2, 4]
+
+def test_task_set_result_async():
+    import asyncio
+    task = mlflow_tasks.Task(write_log=True, experiment_name="test_task_set_result_async")
+    asyncio.run(task.set_result_async([1,2,3]))
+    task.end_run()
+    task2 = asyncio.run(mlflow_tasks.get_task_async(task.run_id))
+    task2.end_run()
+    assert asyncio.run(task2.get_result_async()) == [1,2,3]
+
+def times_three(x):
+    return x*3
+
+def test_task_exec_func_process():
+    task = mlflow_tasks.Task(times_three, x=8, executor="process", experiment_name="test_task_exec_func_process")
+    assert task.get_run().info.status == "FINISHED"
+    res = task.get_result()
+    assert res == 24
+
+def test_task_exec_func_process_async():
+    tasks = [mlflow_tasks.Task(times_three, x=i, executor="process", executor_workers=2, synchronous=False, experiment_name="test_task_exec_func_process_async") for i in range(4)]
+    res = [t.get_result() for t in tasks]
+    assert res == [0, 3, 6, 9]
+    assert all(t.done() for t in tasks)
+
+def test_task_exec_func_process_data_handler(tmp_path):
+    # The worker process's Task uses the handler it was given
+    handler = mlflow_tasks.data_handlers.Py_Obj_Handler(global_cache_dir=str(tmp_path))
+    task = mlflow_tasks.Task(times_three, x=8, executor="process", data_handler=handler, experiment_name="test_task_exec_func_process")
+    assert task.get_result() == 24
+    worker_handler = mlflow_tasks.data_handlers.data_handler_from_path(f"{task.experiment_id}/{task.run_id}/result")
+    assert worker_handler.global_cache_dir == str(tmp_path)
+
+def test_task_exec_script_forkserver():
+    tasks = [mlflow_tasks.Task("tests/script.py", test_param=i, executor="forkserver", synchronous=False, experiment_name="test_task_exec_script_forkserver") for i in range(3)]
+    res = [t.get_result() for t in tasks]
+    assert res == [0, 2, 4]
+
+def test_compile_script_cache():
+    from mlflow_tasks.executors import compile_script
+    code = compile_script("tests/script.py")
+    assert compile_script("tests/script.py") is code
+
+def test_task_timings():
+    from mlflow_tasks import timing
+    phases = []
+    def hook(task, phase, start_time, end_time):
+        phases.append(phase)
+    timing.phase_hooks.append(hook)
+    try:
+        task = mlflow_tasks.Task(lambda x: x+1, x=1, experiment_name="test_task_timings")
+    finally:
+        timing.phase_hooks.remove(hook)
+    metrics = task.get_run().data.metrics
+    for phase in ["experiment", "start_run", "log_params", "action", "set_result", "total"]:
+        assert "time_" + phase in metrics
+    assert "action" in phases
+
+def test_task_reopen_keeps_timings():
+    task = mlflow_tasks.Task(lambda x: x+1, x=1, experiment_name="test_task_reopen_keeps_timings")
+    metrics = task.get_run().data.metrics
+    # Reopening the run records nothing over the task's own timings
+    mlflow_tasks.get_task(task.run_id).end_run()
+    assert task.get_run().data.metrics == metrics
+
+def test_task_reopen_changed_param():
+    task = mlflow_tasks.Task(lambda x: x+"!", x="a", experiment_name="test_task_reopen_changed_param")
+    # A changed value isn't hidden behind the logged one
+    with pytest.raises(Exception):
+        mlflow_tasks.Task(lambda x: x+"!", run_id=task.run_id, x="b")
+    mlflow.end_run("FAILED")
+    assert task.get_run().data.params["x"] == "a"
+
+def test_task_profile():
+    task = mlflow_tasks.Task(lambda x: [i*x for i in range(1000)], x=2, profile="all", experiment_name="test_task_profile")
+    metrics = task.get_run().data.metrics
+    assert metrics["profile_peak_memory"] > 0
+    assert "profile_cpu_time" in metrics
+    artifacts = [f.path for f in mlflow.tracking.MlflowClient().list_artifacts(task.run_id, "profile")]
+    assert "profile/action.pstats" in artifacts
+    assert "profile/action_memory.txt" in artifacts
+
+def test_task_profile_process():
+    task = mlflow_tasks.Task(times_three, x=8, profile="cpu", executor="process", experiment_name="test_task_profile_process")
+    assert task.get_result() == 24
+    assert "profile_cpu_time" in task.get_run().data.metrics
+
+def test_task_func_batch_size_param():
+    # Common names like batch_size are passed to functions, not taken by the Task
+    task = mlflow_tasks.Task(lambda x, batch_size=1, workers=1: x * batch_size * workers, x=1, batch_size=64, workers=2, experiment_name="test_task_func_batch_size_param")
+    assert task.get_result() == 128
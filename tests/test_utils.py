@@ -12,6 +12,7 @@ except:
 
 sys.path.insert(0, project_folder)
 
+import pytest
 import mlflow
 import mlflow_tasks
 
@@ -46,3 +47,121 @@ def test_get_task():
     task = mlflow_tasks.get_task(act_task.run_id)
     task.end_run()
     assert isinstance(task, mlflow_tasks.Task)
+
+def test_lazy_imports():
+    # Importing mlflow_tasks shouldn't load the notebook or model stacks
+    import subprocess
+    check = "import sys, mlflow_tasks; print([m for m in ['papermill', 'nbconvert', 'mlflow.pyfunc'] if m in sys.modules])"
+    output = subprocess.run([sys.executable, "-c", check], cwd=project_folder, capture_output=True, text=True, check=True).stdout
+    assert output.strip().splitlines()[-1] == "[]"
+
+def test_load_results():
+    import pandas as pd
+    tasks = [mlflow_tasks.Task(lambda x: x*2, x=i, write_log=True, experiment_name="test_load_results") for i in range(3)]
+    results = mlflow_tasks.load_results(run_ids=[t.run_id for t in tasks])
+    assert list(results.index) == [t.run_id for t in tasks]
+    assert list(results["result"]) == [0, 2, 4]
+
+def test_load_results_dataframes():
+    import pandas as pd
+    tasks = [mlflow_tasks.Task(lambda x: pd.DataFrame({"a": [x, x+1]}), x=i, write_log=True, experiment_name="test_load_results_dataframes") for i in range(2)]
+    results = mlflow_tasks.load_results(experiment_name="test_load_results_dataframes", filter_string="attributes.status = 'FINISHED'")
+    assert results.index.names[0] == "run_id"
+    assert results.loc[tasks[1].run_id]["a"].tolist() == [1, 2]
+
+def test_get_task_read_only():
+    task = mlflow_tasks.Task(lambda x: x*2, x=4, write_local_cache=True, experiment_name="test_get_task_read_only")
+    # Reading the cached result mustn't need the tracking server
+    tracking_uri = mlflow.get_tracking_uri()
+    mlflow.set_tracking_uri("http://127.0.0.1:1")
+    try:
+        cached_task = mlflow_tasks.get_task(task.run_id, read_only=True)
+        assert cached_task.get_result() == 8
+    finally:
+        mlflow.set_tracking_uri(tracking_uri)
+    with pytest.raises(Exception):
+        cached_task.set_result(9)
+
+def test_shared_client():
+    import pickle
+    from mlflow_tasks.client import get_client
+    client = get_client()
+    assert get_client() is client
+    assert pickle.loads(pickle.dumps(client)) is client
+    assert mlflow_tasks.data_handlers.Py_Obj_Handler().mlflow_client is client
+
+def test_client_retries(monkeypatch):
+    # A stand-in tracking server that drops the first connections
+    import json
+    import threading
+    from http.server import HTTPServer, BaseHTTPRequestHandler
+    from mlflow_tasks.client import get_client
+    requests_seen = []
+    dropped = {"count": 2}
+    class Flaky_Tracking_Server(BaseHTTPRequestHandler):
+        def do_GET(self):
+            requests_seen.append(self.path)
+            if len(requests_seen) <= dropped["count"]:
+                self.close_connection = True
+                return
+            body = json.dumps({"run": {"info": {"run_id": "abc", "experiment_id": "0", "status": "FINISHED", "start_time": 0, "lifecycle_stage": "active", "artifact_uri": ""}, "data": {}}}).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        def log_message(self, *args):
+            pass
+    server = HTTPServer(("127.0.0.1", 0), Flaky_Tracking_Server)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    monkeypatch.setenv("MLFLOW_HTTP_REQUEST_MAX_RETRIES", "2")
+    monkeypatch.setenv("MLFLOW_HTTP_REQUEST_BACKOFF_FACTOR", "0")
+    client = get_client(f"http://127.0.0.1:{server.server_port}")
+    try:
+        # MLFlow's own retries get through
+        assert client.get_run("abc").info.run_id == "abc"
+        assert len(requests_seen) == 3
+        # A dead server is only tried as often as MLFlow retries, not again for each of those
+        requests_seen.clear()
+        dropped["count"] = 100
+        with pytest.raises(Exception):
+            client.get_run("abc")
+        assert len(requests_seen) == 3
+    finally:
+        server.shutdown()
+
+def test_client_retries_other_errors():
+    from mlflow_tasks.client import Retrying_Client, configure_client
+    import threading
+    class Flaky_Store:
+        calls = 0
+        def download_artifacts(self, run_id, path):
+            self.calls += 1
+            if self.calls < 3:
+                raise ConnectionError("network file system went away")
+            return path
+        def log_batch(self, run_id, metrics=(), params=()):
+            self.calls += 1
+            raise ConnectionError("network file system went away")
+    configure_client(backoff=0.01)
+    try:
+        client = Retrying_Client(Flaky_Store(), "stub", threading.BoundedSemaphore(1))
+        assert client.download_artifacts("abc", "result") == "result"
+        assert client.client.calls == 3
+        # Logging metrics again could duplicate them, so it isn't retried
+        client.client.calls = 0
+        with pytest.raises(ConnectionError):
+            client.log_batch("abc", metrics=[1])
+        assert client.client.calls == 1
+    finally:
+        configure_client(backoff=0.5)
+
+def test_get_task_read_only_context():
+    task = mlflow_tasks.Task(lambda x: x*2, x=4, write_local_cache=True, experiment_name="test_get_task_read_only_context")
+    metrics = task.get_run().data.metrics
+    with mlflow.start_run(nested=True) as caller_run:
+        with mlflow_tasks.get_task(task.run_id, read_only=True) as cached_task:
+            assert cached_task.get_result() == 8
+        # The caller's run is still active, and the past run is untouched
+        assert mlflow.active_run().info.run_id == caller_run.info.run_id
+    assert task.get_run().data.metrics == metrics